@@ -6,14 +6,45 @@ import datetime
 import tempfile
 import shutil
 import hashlib
+import hmac
+import glob
+import threading
+import contextlib
+import functools
+import bisect
+import heapq
+import re
+import json
+import base64
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks apply
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # recompute_priority_scores() scores row by row instead
+    np = None
+
+import sqlite_storage
 
 # Configuration: Define file paths and Fieldnames
+# The data directory and storage engine can be changed with configure_storage()
+# or the CITIZEN_AID_DATA_DIR / CITIZEN_AID_STORAGE environment variables.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CITIZENS_CSV_FILE = os.path.join(BASE_DIR, "citizens_data.csv")
-ADMINS_CSV_FILE = os.path.join(BASE_DIR, "admins_data.csv")
-AID_HISTORY_CSV_FILE = os.path.join(BASE_DIR, "aid_history.csv")
-MESSAGES_CSV_FILE = os.path.join(BASE_DIR, "messages.csv")
-ID_COUNTER_FILE = os.path.join(BASE_DIR, "citizen_id_counter.txt")
+DATA_DIR = os.environ.get("CITIZEN_AID_DATA_DIR", BASE_DIR)
+CITIZENS_CSV_FILE = os.path.join(DATA_DIR, "citizens_data.csv")
+ADMINS_CSV_FILE = os.path.join(DATA_DIR, "admins_data.csv")
+AID_HISTORY_CSV_FILE = os.path.join(DATA_DIR, "aid_history.csv")
+MESSAGES_CSV_FILE = os.path.join(DATA_DIR, "messages.csv")
+ID_COUNTER_FILE = os.path.join(DATA_DIR, "citizen_id_counter.txt")
+SQLITE_DB_FILE = os.path.join(DATA_DIR, "citizen_aid.db")
+DEFAULT_STORAGE_ENGINE = "csv"
+
+# CSV engine: updates are appended to a per-table change log, which is folded
+# back into the main CSV file in the background once it grows past this size.
+CHANGELOG_COMPACT_BYTES = 256 * 1024
 
 # Define the exact headers/fieldnames for CSV files
 CITIZENS_FIELDNAMES = [
@@ -34,16 +65,78 @@ MESSAGES_FIELDNAMES = [
     "id", "citizen_internal_id", "message", "timestamp"
 ]
 
+TABLE_FIELDNAMES = {
+    "citizens": CITIZENS_FIELDNAMES,
+    "admins": ADMINS_FIELDNAMES,
+    "aid_history": AID_HISTORY_FIELDNAMES,
+    "messages": MESSAGES_FIELDNAMES
+}
+
+# Password and secret code hashing
+# Stored hashes come in three formats, all accepted by verify_secret():
+#   <64 hex digits>                                  legacy salted SHA-256 (_hash_password)
+#   pbkdf2_sha256$<iterations>$<salt>$<hex digest>   PBKDF2 over the secret
+#   pbkdf2_sha256_legacy$<iterations>$<salt>$<hex>   PBKDF2 over the legacy SHA-256 digest,
+#                                                    made by upgrade_legacy_hash() without the secret
+# New hashes use PASSWORD_KDF ("sha256" or "pbkdf2_sha256").
+PASSWORD_KDF = os.environ.get("CITIZEN_AID_PASSWORD_KDF", "sha256")
+PBKDF2_ITERATIONS = int(os.environ.get("CITIZEN_AID_PBKDF2_ITERATIONS", "200000"))
+PBKDF2_PREFIX = "pbkdf2_sha256"
+LEGACY_PBKDF2_PREFIX = "pbkdf2_sha256_legacy"
+
 # Helper Functions
 def _hash_password(password):
     """Hashes password using SHA-256 with salt."""
     salt = "citizen_aid_system_2024"  # In production, use random salt per user
     return hashlib.sha256((password + salt).encode('utf-8')).hexdigest()
 
+def _pbkdf2_hash(prefix, secret, iterations=None, salt=None):
+    iterations = iterations or PBKDF2_ITERATIONS
+    salt = salt or os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", secret.encode("utf-8"), salt.encode("utf-8"), iterations).hex()
+    return f"{prefix}${iterations}${salt}${digest}"
+
+def hash_secret(secret, kdf=None, iterations=None):
+    """Hashes a password or secret code for storage with the given (or configured) KDF."""
+    kdf = kdf or PASSWORD_KDF
+    if kdf == "sha256":
+        return _hash_password(secret)
+    if kdf == PBKDF2_PREFIX:
+        return _pbkdf2_hash(PBKDF2_PREFIX, secret, iterations)
+    raise ValueError(f"Unknown password KDF {kdf!r}. Choose from: sha256, {PBKDF2_PREFIX}")
+
+def is_legacy_hash(stored_hash):
+    return len(stored_hash) == 64 and all(c in "0123456789abcdef" for c in stored_hash)
+
+def upgrade_legacy_hash(stored_hash, iterations=None):
+    """Wraps a legacy SHA-256 hash in PBKDF2, which needs no plain secret.
+       Hashes in any other format are returned unchanged.
+    """
+    if is_legacy_hash(stored_hash):
+        return _pbkdf2_hash(LEGACY_PBKDF2_PREFIX, stored_hash, iterations)
+    return stored_hash
+
+def verify_secret(secret, stored_hash):
+    """Checks a password or secret code against a stored hash of any supported
+       format, comparing in constant time.
+    """
+    parts = stored_hash.split("$")
+    if len(parts) == 4 and parts[0] in (PBKDF2_PREFIX, LEGACY_PBKDF2_PREFIX):
+        prefix, iterations, salt, _ = parts
+        try:
+            iterations = int(iterations)
+        except ValueError:
+            return False
+        material = secret if prefix == PBKDF2_PREFIX else _hash_password(secret)
+        candidate = _pbkdf2_hash(prefix, material, iterations, salt)
+    else:
+        candidate = _hash_password(secret)
+    return hmac.compare_digest(candidate.encode("utf-8"), stored_hash.encode("utf-8"))
+
 def read_csv_dict(file_path, fieldnames):
     """Reads a CSV file and yields each row as a dictionary."""
     try:
-        with open(file_path, "r", newline="", encoding="utf-8") as f:
+        with open(file_path, "r", newline="", encoding="utf-8-sig") as f:
             reader = csv.DictReader(f)
             for row in reader:
                 yield {field: row.get(field, "") for field in fieldnames}
@@ -56,19 +149,64 @@ def read_csv_dict(file_path, fieldnames):
 
 def append_csv_dict(file_path, data_dict, fieldnames):
     """Appends a single dictionary as a new row to a CSV file."""
+    return append_csv_dicts(file_path, [data_dict], fieldnames)
+
+def append_csv_dicts(file_path, list_of_dicts, fieldnames):
+    """Appends dictionaries as new rows to a CSV file, opening it only once."""
     file_exists = os.path.isfile(file_path) and os.path.getsize(file_path) > 0
     try:
         with open(file_path, "a", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
             if not file_exists:
                 writer.writeheader()
-            row_to_write = {field: data_dict.get(field, "") for field in fieldnames}
-            writer.writerow(row_to_write)
+            writer.writerows({field: data_dict.get(field, "") for field in fieldnames} for data_dict in list_of_dicts)
         return True
     except IOError as e:
         print(f"Error appending to CSV {file_path}: {e}")
         return False
 
+def _iter_csv_records(f):
+    """Yields (byte offset, raw bytes) for each CSV record from the current position
+       of a binary file. A quoted field may span lines; a record is complete once
+       its quotes balance. An unterminated quoted record at the end is held back.
+    """
+    offset = f.tell()
+    pending = b""
+    for line in f:
+        pending += line
+        if pending.count(b'"') % 2 == 0:
+            yield offset, pending
+            offset += len(pending)
+            pending = b""
+
+def _parse_csv_record(record, first=False):
+    text = record.decode("utf-8-sig" if first else "utf-8", errors="replace")
+    values = next(csv.reader([text]), [])
+    if len(values) == 1 and "\t" in values[0]:
+        values = values[0].split("\t")  # Legacy rows: tab-separated values inside one quoted field
+    return values
+
+@contextlib.contextmanager
+def _file_lock(file_path, shared=False):
+    """Holds an advisory lock on file_path (created if missing) for the block:
+       shared locks only exclude exclusive ones, exclusive locks exclude both.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        lock_file = open(file_path, "a")
+    except OSError:
+        # Missing or read-only data directory: there is no writer to coordinate with
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def overwrite_csv_dict(file_path, list_of_dicts, fieldnames):
     """Overwrites a CSV file with a list of dictionaries."""
     temp_file_path = None
@@ -94,52 +232,922 @@ def overwrite_csv_dict(file_path, list_of_dicts, fieldnames):
                 pass
         return False
 
-def get_next_citizen_id_csv():
-    """Determines the next citizen ID by finding the max ID in the CSV file."""
-    max_id = 0
+# Dates in the data files
+# Older files hold dotted dates with day and month in either order ("27. 04. 2025",
+# "04. 27. 2025  12:00:00 AM"); the app writes ISO dates. Parsed values are memoized
+# because the same few hundred dates repeat across thousands of rows.
+_DOTTED_DATE = re.compile(r"(\d{1,4})\s*[./-]\s*(\d{1,2})\s*[./-]\s*(\d{1,4})"
+                          r"(?:[\sT]+(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?\s*([AaPp][Mm])?)?")
+PARSED_DATE_CACHE_SIZE = 100000
+_parsed_dates = {}
+
+def _build_datetime(year, month, day, time_parts):
+    hour, minute, second, fraction, meridiem = time_parts
+    hour = int(hour or 0)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    microsecond = int((fraction or "0").ljust(6, "0"))
+    return datetime.datetime(int(year), int(month), int(day), hour, int(minute or 0), int(second or 0), microsecond)
+
+def _parse_date_uncached(text, day_first):
     try:
-        existing_ids = []
-        for citizen in read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES):
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    match = _DOTTED_DATE.fullmatch(text)
+    if match is None:
+        return None
+    first, second, third = match.group(1, 2, 3)
+    time_parts = match.group(4, 5, 6, 7, 8)
+    if len(first) == 4:  # Year first ("2025-7-9")
+        orders = [(first, second, third)]
+    elif len(third) == 4:
+        month_first, day_first_order = (third, first, second), (third, second, first)
+        orders = [day_first_order, month_first] if day_first else [month_first, day_first_order]
+    else:
+        return None
+    for year, month, day in orders:
+        try:
+            return _build_datetime(year, month, day, time_parts)
+        except ValueError:
+            continue  # Impossible date in this order ("15. 06. 2025" month-first)
+    return None
+
+def parse_date_text(value, day_first=False):
+    """Parses a date or timestamp from the data files into a datetime, or returns None.
+       Accepts ISO values ("2025-07-06", "2025-7-9", "2025-07-06T03:38:44.707089") and
+       dotted ones with an optional 12-hour time. Dotted dates are read month-first
+       (day-first if day_first is set); an impossible date is retried in the other order.
+    """
+    key = (value, day_first)
+    try:
+        return _parsed_dates[key]
+    except KeyError:
+        pass
+    parsed = _parse_date_uncached(value.strip(), day_first) if isinstance(value, str) else None
+    if len(_parsed_dates) >= PARSED_DATE_CACHE_SIZE:
+        _parsed_dates.clear()
+    _parsed_dates[key] = parsed
+    return parsed
+
+def canonical_date(value, day_first=False):
+    """Returns a date value as "YYYY-MM-DD", or unchanged if it cannot be parsed."""
+    parsed = parse_date_text(value, day_first)
+    return parsed.date().isoformat() if parsed else value
+
+# Storage Engines
+# Every engine stores the four tables as rows of strings keyed by the names in
+# TABLE_FIELDNAMES and implements: setup(), version(table), read_rows(table),
+# find_rows(table, field, value), max_id(table), append_rows(table, rows),
+# update_row(table, row), overwrite_rows(table, rows), reserve_ids(table, count),
+# get_counter(name), set_counter(name, value), compacted_version(table, version)
+# (the version a compaction turned that version into, or None) and locked(table),
+# a re-entrant context manager that keeps other writers out of a table. Two flags
+# tell the backend what an engine is good at:
+# indexed_lookups (find_rows beats the cached indexes) and point_updates
+# (update_row beats rewriting the cached table).
+class CsvStorage:
+    """Stores each table in its CSV file inside data_dir (the original format).
+       update_row appends the new version of the row to a change log next to the
+       table ("<name>.changes.<inode>.csv"); readers merge the log over the table.
+       The log is tied to the table file's inode, so once a rewrite replaces the
+       file an older log can never be applied on top of newer data.
+       Every table has an fcntl lock file ("<name>.lock") so several processes can
+       share data_dir: readers take it shared, writers exclusive.
+    """
+    name = "csv"
+    indexed_lookups = False
+    point_updates = True
+    # Append-only tables whose rows are looked up per citizen through a byte-offset index
+    OFFSET_INDEXED_FIELDS = {("messages", "citizen_internal_id"), ("aid_history", "citizen_internal_id")}
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.files = {
+            "citizens": os.path.join(data_dir, "citizens_data.csv"),
+            "admins": os.path.join(data_dir, "admins_data.csv"),
+            "aid_history": os.path.join(data_dir, "aid_history.csv"),
+            "messages": os.path.join(data_dir, "messages.csv")
+        }
+        # One ID sequence per table holding the last ID handed out
+        self.counter_files = {table: os.path.join(data_dir, f"{table}_id_counter.txt") for table in TABLE_FIELDNAMES}
+        self.counter_files["citizens"] = os.path.join(data_dir, "citizen_id_counter.txt")
+        self.counter_file = self.counter_files["citizens"]
+        self.lock_files = {table: f"{os.path.splitext(path)[0]}.lock" for table, path in self.files.items()}
+        self.compact_threshold = CHANGELOG_COMPACT_BYTES
+        self._write_lock = threading.RLock()
+        self._held_locks = threading.local()
+        self._compacting = set()
+        self._compactions = {}  # table -> (version before, version after) of the last compaction
+        self._offset_indexes = {}
+        self._offset_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _table_lock(self, table, shared=False):
+        """Holds the table's lock file, shared for readers and exclusive for writers.
+           Re-entrant per thread: a nested request runs under the lock already held.
+        """
+        held = getattr(self._held_locks, "tables", None)
+        if held is None:
+            held = self._held_locks.tables = set()
+        if table in held:
+            yield
+            return
+        thread_lock = contextlib.nullcontext() if shared else self._write_lock
+        with thread_lock, _file_lock(self.lock_files[table], shared):
+            held.add(table)
+            try:
+                yield
+            finally:
+                held.discard(table)
+
+    def locked(self, table):
+        """Keeps other threads and processes from writing the table inside the block."""
+        return self._table_lock(table)
+
+    def _changelog_file(self, table):
+        """Returns the change log that belongs to the current table file, or None if it is missing."""
+        signature = _file_signature(self.files[table])
+        if signature is None:
+            return None
+        return f"{os.path.splitext(self.files[table])[0]}.changes.{signature[2]}.csv"
+
+    def _read_changes(self, table):
+        """Returns {id: latest logged row} for the table's current change log."""
+        changelog_file = self._changelog_file(table)
+        changes = {}
+        if changelog_file and os.path.isfile(changelog_file):
+            for row in read_csv_dict(changelog_file, TABLE_FIELDNAMES[table]):
+                changes[row.get("id")] = row
+        return changes
+
+    def _merge_changes(self, table, changes):
+        for row in read_csv_dict(self.files[table], TABLE_FIELDNAMES[table]):
+            yield changes.get(row.get("id"), row)
+
+    def setup(self):
+        for table, file_path in self.files.items():
+            if not os.path.isfile(file_path):
+                try:
+                    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+                    with open(file_path, "w", newline="", encoding="utf-8") as f:
+                        writer = csv.DictWriter(f, fieldnames=TABLE_FIELDNAMES[table])
+                        writer.writeheader()
+                    print(f"Created {file_path} with headers: {TABLE_FIELDNAMES[table]}")
+                except IOError as e:
+                    print(f"Error creating {file_path}: {e}")
+
+        if not os.path.exists(self.counter_file):
             try:
-                citizen_id = int(citizen.get("id", 0))
-                existing_ids.append(citizen_id)
+                with open(self.counter_file, "w") as f:
+                    f.write("0")
+                print(f"Created and initialized {self.counter_file}")
+            except IOError as e:
+                print(f"Error creating {self.counter_file}: {e}")
+
+    def version(self, table):
+        changelog_file = self._changelog_file(table)
+        return (_file_signature(self.files[table]), changelog_file and _file_signature(changelog_file))
+
+    def compacted_version(self, table, version):
+        """Returns the version a compaction left the table at if it started from
+           version, or None. The rows are the same; only the files changed.
+        """
+        before, after = self._compactions.get(table, (None, None))
+        return after if before == version else None
+
+    def read_rows(self, table):
+        with self._table_lock(table, shared=True):
+            changes = self._read_changes(table)
+            if not changes:
+                return list(read_csv_dict(self.files[table], TABLE_FIELDNAMES[table]))
+            return list(self._merge_changes(table, changes))
+
+    def find_rows(self, table, field, value):
+        if (table, field) in self.OFFSET_INDEXED_FIELDS:
+            with self._table_lock(table, shared=True):
+                if not self._read_changes(table):
+                    return self._find_by_offsets(table, field, str(value))
+        return [row for row in self.read_rows(table) if row.get(field) == str(value)]
+
+    def _refresh_offset_index(self, table, field):
+        """Brings the {value: [byte offsets]} index of a table up to date by reading
+           only the bytes appended past its watermark. Starts over when the file was
+           replaced or shrank. Returns the index, or None if the file is missing.
+        """
+        try:
+            st = os.stat(self.files[table])
+        except OSError:
+            return None
+        index = self._offset_indexes.get((table, field))
+        if index is None or index["inode"] != st.st_ino or st.st_size < index["watermark"]:
+            index = {"inode": st.st_ino, "watermark": 0, "columns": None, "offsets": {}}
+            self._offset_indexes[(table, field)] = index
+        if st.st_size == index["watermark"]:
+            return index
+
+        with open(self.files[table], "rb") as f:
+            f.seek(index["watermark"])
+            for offset, record in _iter_csv_records(f):
+                values = _parse_csv_record(record, first=offset == 0)
+                if index["columns"] is None:
+                    index["columns"] = values
+                elif field in index["columns"]:
+                    position = index["columns"].index(field)
+                    if position < len(values):
+                        index["offsets"].setdefault(values[position], []).append(offset)
+                index["watermark"] = offset + len(record)
+        return index
+
+    def _find_by_offsets(self, table, field, value):
+        with self._offset_lock:
+            index = self._refresh_offset_index(table, field)
+            if index is None:
+                return []
+            columns = index["columns"] or []
+            offsets = list(index["offsets"].get(value, []))
+        rows = []
+        with open(self.files[table], "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = next(_iter_csv_records(f), (offset, b""))[1]
+                values = dict(zip(columns, _parse_csv_record(record)))
+                rows.append({name: values.get(name, "") for name in TABLE_FIELDNAMES[table]})
+        return rows
+
+    def max_id(self, table):
+        max_id = 0
+        for row in self.read_rows(table):
+            try:
+                max_id = max(max_id, int(row.get("id", 0)))
             except (ValueError, TypeError):
-                print(f"Warning: Skipping row with invalid ID format: {citizen.get('id')}")
                 continue
+        return max_id
 
-        if existing_ids:
-            max_id = max(existing_ids)
-        else:
+    def append_rows(self, table, rows):
+        with self._table_lock(table):
+            return append_csv_dicts(self.files[table], rows, TABLE_FIELDNAMES[table])
+
+    def update_row(self, table, row):
+        """Records the new version of a row with one append to the change log."""
+        with self._table_lock(table):
+            changelog_file = self._changelog_file(table)
+            if changelog_file is None:
+                return False
+            if not append_csv_dict(changelog_file, row, TABLE_FIELDNAMES[table]):
+                return False
+        if self.compact_threshold and os.path.getsize(changelog_file) > self.compact_threshold:
+            self.compact_in_background(table)
+        return True
+
+    def overwrite_rows(self, table, rows):
+        with self._table_lock(table):
+            if not overwrite_csv_dict(self.files[table], rows, TABLE_FIELDNAMES[table]):
+                return False
+            self._remove_stale_changelogs(table)
+        return True
+
+    def _remove_stale_changelogs(self, table):
+        current = self._changelog_file(table)
+        for changelog_file in glob.glob(f"{glob.escape(os.path.splitext(self.files[table])[0])}.changes.*.csv"):
+            if changelog_file != current:
+                try:
+                    os.remove(changelog_file)
+                except OSError as e:
+                    print(f"Warning: Could not remove old change log {changelog_file}: {e}")
+
+    def compact(self, table):
+        """Folds the change log back into the table file with one atomic rewrite."""
+        with self._table_lock(table):
+            changes = self._read_changes(table)
+            if not changes:
+                return True
+            before = self.version(table)
+            compacted = self.overwrite_rows(table, list(self._merge_changes(table, changes)))
+            if compacted:
+                self._compactions[table] = (before, self.version(table))
+        if compacted:
+            print(f"Compacted {len(changes)} logged changes into {self.files[table]}.")
+        return compacted
+
+    def compact_in_background(self, table):
+        """Starts compact(table) on a daemon thread unless one is already running."""
+        with self._write_lock:
+            if table in self._compacting:
+                return
+            self._compacting.add(table)
+
+        def run():
             try:
-                if os.path.exists(ID_COUNTER_FILE):
-                    with open(ID_COUNTER_FILE, "r") as f:
-                        content = f.read().strip()
-                        if content:
-                            counter_val = int(content)
-                            if counter_val > max_id: 
-                                max_id = counter_val - 1
-            except (IOError, ValueError):
-                max_id = 0
+                self.compact(table)
+            finally:
+                with self._write_lock:
+                    self._compacting.discard(table)
 
-    except FileNotFoundError:
-        max_id = 0
-    except Exception as e:
-        print(f"Error reading {CITIZENS_CSV_FILE} to determine max ID: {e}. Starting ID from 0.")
+        threading.Thread(target=run, name=f"compact-{table}", daemon=True).start()
+
+    def _last_row_id(self, table):
+        """Reads the ID of the table's last row from the end of the file (None if unknown)."""
+        try:
+            with open(self.files[table], "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 4096))
+                lines = f.read().decode("utf-8", errors="ignore").splitlines()
+        except OSError:
+            return None
+        for line in reversed(lines):
+            if line.strip():
+                try:
+                    return int(next(csv.reader([line]))[0])
+                except (ValueError, IndexError):
+                    return None
+        return None
+
+    def reserve_ids(self, table, count=1):
+        """Hands out count consecutive IDs and returns the first one. The counter file
+           is locked while it is advanced; a missing counter, or one behind the last
+           row of the table, is rebuilt with one scan of the table.
+        """
+        counter_file = self.counter_files[table]
+        os.makedirs(os.path.dirname(counter_file) or ".", exist_ok=True)
+        # Always table lock first, then counter lock, so writers cannot deadlock
+        with self._table_lock(table), _file_lock(counter_file):
+            last_id = self.get_counter(table)
+            tail_id = self._last_row_id(table)
+            if last_id is None or (tail_id is not None and tail_id > last_id):
+                last_id = max(last_id or 0, self.max_id(table))
+                print(f"Info: Rebuilt the {table} ID counter from the table (last ID {last_id}).")
+            if not self.set_counter(table, last_id + count):
+                raise IOError(f"could not update {counter_file}")
+        return last_id + 1
+
+    def get_counter(self, name):
+        try:
+            with open(self.counter_files[name], "r") as f:
+                content = f.read().strip()
+                return int(content) if content else None
+        except (IOError, ValueError):
+            return None
+
+    def set_counter(self, name, value):
+        counter_file = self.counter_files[name]
+        try:
+            os.makedirs(os.path.dirname(counter_file) or ".", exist_ok=True)
+            with open(counter_file, "w") as f:
+                f.write(str(value))
+            return True
+        except IOError as e:
+            print(f"Warning: Could not update {counter_file}: {e}")
+            return False
+
+class MemoryStorage:
+    """Keeps every table in process memory; nothing is written to disk.
+       Seeded from the CSV files in data_dir when they exist, which makes it
+       a safe engine for tests, demos and benchmarks.
+    """
+    name = "memory"
+    indexed_lookups = False
+    point_updates = True
+
+    def __init__(self, data_dir=None):
+        self.tables = {table: [] for table in TABLE_FIELDNAMES}
+        self.positions = {table: {} for table in TABLE_FIELDNAMES}
+        self.versions = {table: 0 for table in TABLE_FIELDNAMES}
+        self.counters = {}
+        self._lock = threading.RLock()
+        if data_dir:
+            seed = CsvStorage(data_dir)
+            for table in TABLE_FIELDNAMES:
+                if os.path.isfile(seed.files[table]):
+                    self.append_rows(table, list(seed.read_rows(table)))
+            for table in TABLE_FIELDNAMES:
+                counter = seed.get_counter(table)
+                if counter is not None:
+                    self.counters[table] = counter
+
+    def setup(self):
+        pass
+
+    def locked(self, table):
+        return self._lock
+
+    def version(self, table):
+        return self.versions[table]
+
+    def compacted_version(self, table, version):
+        return None  # Nothing to compact
+
+    def read_rows(self, table):
+        return [dict(row) for row in self.tables[table]]
+
+    def find_rows(self, table, field, value):
+        return [dict(row) for row in self.tables[table] if row.get(field) == str(value)]
+
+    def max_id(self, table):
         max_id = 0
+        for row in self.tables[table]:
+            try:
+                max_id = max(max_id, int(row.get("id", 0)))
+            except (ValueError, TypeError):
+                continue
+        return max_id
+
+    def append_rows(self, table, rows):
+        for row in rows:
+            stored = {field: row.get(field, "") for field in TABLE_FIELDNAMES[table]}
+            self.positions[table].setdefault(stored["id"], len(self.tables[table]))
+            self.tables[table].append(stored)
+        self.versions[table] += 1
+        return True
+
+    def update_row(self, table, row):
+        position = self.positions[table].get(str(row.get("id")))
+        if position is None:
+            return False
+        self.tables[table][position] = {field: row.get(field, "") for field in TABLE_FIELDNAMES[table]}
+        self.versions[table] += 1
+        return True
+
+    def overwrite_rows(self, table, rows):
+        self.tables[table] = []
+        self.positions[table] = {}
+        return self.append_rows(table, rows)
+
+    def reserve_ids(self, table, count=1):
+        last_id = self.counters.get(table)
+        if last_id is None:
+            last_id = self.max_id(table)
+        elif self.tables[table]:
+            try:
+                last_id = max(last_id, int(self.tables[table][-1].get("id", 0)))
+            except (ValueError, TypeError):
+                pass
+        self.counters[table] = last_id + count
+        return last_id + 1
+
+    def get_counter(self, name):
+        return self.counters.get(name)
+
+    def set_counter(self, name, value):
+        self.counters[name] = int(value)
+        return True
+
+# Engine name -> factory(data_dir). Add entries with register_storage_engine().
+STORAGE_ENGINES = {
+    "csv": CsvStorage,
+    "memory": MemoryStorage,
+    "sqlite": lambda data_dir: sqlite_storage.SqliteStorage(os.path.join(data_dir, "citizen_aid.db"), TABLE_FIELDNAMES)
+}
 
-    next_id = max_id + 1
+_storage = None
 
+def register_storage_engine(name, factory):
+    """Makes a storage engine available to configure_storage() under the given name."""
+    STORAGE_ENGINES[name] = factory
+
+def configure_storage(engine=None, data_dir=None):
+    """Selects the storage engine and data directory for the whole backend.
+       Defaults come from CITIZEN_AID_STORAGE and CITIZEN_AID_DATA_DIR.
+       Returns the new engine.
+    """
+    global _storage, DATA_DIR, CITIZENS_CSV_FILE, ADMINS_CSV_FILE, AID_HISTORY_CSV_FILE
+    global MESSAGES_CSV_FILE, ID_COUNTER_FILE, SQLITE_DB_FILE
+    engine = engine or os.environ.get("CITIZEN_AID_STORAGE", DEFAULT_STORAGE_ENGINE)
+    data_dir = data_dir or os.environ.get("CITIZEN_AID_DATA_DIR", DATA_DIR)
+    if engine not in STORAGE_ENGINES:
+        raise ValueError(f"Unknown storage engine {engine!r}. Choose from: {', '.join(sorted(STORAGE_ENGINES))}")
+
+    DATA_DIR = data_dir
+    CITIZENS_CSV_FILE = os.path.join(data_dir, "citizens_data.csv")
+    ADMINS_CSV_FILE = os.path.join(data_dir, "admins_data.csv")
+    AID_HISTORY_CSV_FILE = os.path.join(data_dir, "aid_history.csv")
+    MESSAGES_CSV_FILE = os.path.join(data_dir, "messages.csv")
+    ID_COUNTER_FILE = os.path.join(data_dir, "citizen_id_counter.txt")
+    SQLITE_DB_FILE = os.path.join(data_dir, "citizen_aid.db")
+
+    if _storage is not None and hasattr(_storage, "close"):
+        _storage.close()
+    _storage = STORAGE_ENGINES[engine](data_dir)
+    invalidate_table_cache()
+    _stats_cache.clear()
+    return _storage
+
+def get_storage():
+    """Returns the active storage engine, configuring it from the environment on first use."""
+    if _storage is None:
+        configure_storage()
+    return _storage
+
+def compact_citizen_changelog():
+    """Folds pending logged citizen updates into citizens_data.csv (CSV engine only)."""
+    storage = get_storage()
+    if hasattr(storage, "compact"):
+        return storage.compact("citizens")
+    return True
+
+def _table_file(table):
+    """Returns the CSV file that holds a table."""
+    return {
+        "citizens": CITIZENS_CSV_FILE,
+        "admins": ADMINS_CSV_FILE,
+        "aid_history": AID_HISTORY_CSV_FILE,
+        "messages": MESSAGES_CSV_FILE
+    }[table]
+
+def _table_for_file(file_path):
+    """Returns the table name stored in a CSV file, or None for unknown files."""
+    for table in TABLE_FIELDNAMES:
+        if _table_file(table) == file_path:
+            return table
+    return None
+
+# Table Cache
+# Parsed tables are kept in memory and reused until the engine reports a new
+# table version (file mtime, size and inode for CSV, a write counter for the
+# other engines) or a backend write invalidates them. Named indexes over the cached rows are
+# built lazily and kept in sync by the backend's own writes. _cache_lock guards the cache,
+# and every function that walks cached rows or indexes runs under it, so the GUI thread
+# and the background worker can both call the backend. It is always taken before a
+# storage lock (see locked_table()).
+_table_cache = {}
+_cache_lock = threading.RLock()
+BULK_APPEND_REINDEX_ROWS = 1000  # Batches larger than this (and 5% of the table) rebuild the indexes
+# index name -> (build(rows), add(index, row, position), update(index, old_row, new_row, position));
+# update may be None for indexes that cannot be patched, which are dropped and rebuilt on next use
+_table_indexes = {}
+# Indexes that large batches patch too, because rebuilding them costs more than the patching
+_patched_in_bulk = set()
+
+def _file_signature(file_path):
+    """Returns a cheap (mtime_ns, size, inode) signature, or None if missing."""
     try:
-        os.makedirs(os.path.dirname(ID_COUNTER_FILE) or ".", exist_ok=True)
-        with open(ID_COUNTER_FILE, "w") as f:
-            f.write(str(next_id))
-    except IOError as e:
-        print(f"Warning: Could not update {ID_COUNTER_FILE}: {e}")
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+def _table_signature(table):
+    """Returns a cheap value that changes whenever the table's stored data changes."""
+    return get_storage().version(table)
+
+def _load_rows(table):
+    """Reads every row of a table from storage, bypassing the cache."""
+    return get_storage().read_rows(table)
+
+def _holds_cache_lock(func):
+    """Runs func under _cache_lock, for functions that walk cached rows or indexes."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _cache_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+@contextlib.contextmanager
+def locked_table(table):
+    """Holds _cache_lock and then the table's storage lock, so no other thread or
+       process writes the table inside the block. Use it instead of the storage's
+       own locked() whenever the block touches the cache.
+    """
+    with _cache_lock, get_storage().locked(table):
+        yield
+
+def _current_entry(table, signature):
+    """Returns the cache entry of a table if it holds the rows of version signature,
+       else None. An entry survives the CSV engine compacting its change log.
+    """
+    entry = _table_cache.get(table)
+    if entry is not None and entry["signature"] != signature and \
+       get_storage().compacted_version(table, entry["signature"]) == signature:
+        entry["signature"] = signature  # Same rows, only stored differently
+    return entry if entry is not None and entry["signature"] == signature else None
+
+def _cached_rows(table):
+    """Returns the cached list of row dicts for a table, reloading it if the table changed.
+       The returned rows are shared; callers must copy a row before modifying it, and
+       must hold _cache_lock while they use it.
+    """
+    with _cache_lock:
+        signature = _table_signature(table)
+        entry = _current_entry(table, signature)
+        if entry is None:
+            entry = {"signature": signature, "rows": list(_load_rows(table)), "indexes": {}}
+            _table_cache[table] = entry
+        return entry["rows"]
+
+def _cached_index(table, index_name):
+    """Returns a named index over the cached rows of a table, building it on first use.
+       Like the rows, the index is shared and only valid while _cache_lock is held.
+    """
+    with _cache_lock:
+        rows = _cached_rows(table)
+        indexes = _table_cache[table]["indexes"]
+        if index_name not in indexes:
+            build = _table_indexes[index_name][0]
+            indexes[index_name] = build(rows)
+        return indexes[index_name]
+
+def invalidate_table_cache(table=None):
+    """Drops the cached copy of one table, or of every table when no name is given."""
+    with _cache_lock:
+        if table is None:
+            _table_cache.clear()
+        else:
+            _table_cache.pop(table, None)
+
+def _sync_cache_after_append(table, pre_signature, new_rows):
+    """Adds rows the backend just appended to the cached table and its indexes
+       (called under locked_table()). Falls back to dropping the cache if the table
+       was changed by someone else. A large batch rebuilds the indexes instead (except
+       _patched_in_bulk), which beats inserting that many rows into sorted indexes
+       one at a time.
+    """
+    entry = _current_entry(table, pre_signature)
+    if entry is None:
+        invalidate_table_cache(table)
+        return
+    rows = entry["rows"]
+    rebuild = []
+    if len(new_rows) > max(BULK_APPEND_REINDEX_ROWS, len(rows) // 20):
+        rebuild = [name for name in entry["indexes"] if name not in _patched_in_bulk]
+        for index_name in rebuild:
+            del entry["indexes"][index_name]
+    for row in new_rows:
+        rows.append(row)
+        for index_name, index in entry["indexes"].items():
+            _table_indexes[index_name][1](index, row, len(rows) - 1)
+    for index_name in rebuild:
+        entry["indexes"][index_name] = _table_indexes[index_name][0](rows)
+    entry["signature"] = _table_signature(table)
+
+def _sync_cache_after_update(table, pre_signature, position, new_row):
+    """Replaces one cached row the backend just rewrote and updates its indexes
+       (called under locked_table()).
+    """
+    entry = _current_entry(table, pre_signature)
+    if entry is None:
+        invalidate_table_cache(table)
+        return
+    old_row = entry["rows"][position]
+    entry["rows"][position] = new_row
+    for index_name, index in list(entry["indexes"].items()):
+        update = _table_indexes[index_name][2]
+        if update is None:
+            del entry["indexes"][index_name]
+        else:
+            update(index, old_row, new_row, position)
+    entry["signature"] = _table_signature(table)
+
+def _sync_cache_after_rewrite(table, pre_signature, rows, changed):
+    """Makes rows, the cached rows with changed {position: new row} swapped in, the
+       cached copy and patches the indexes like _sync_cache_after_append() does.
+    """
+    entry = _current_entry(table, pre_signature)
+    if entry is None or len(entry["rows"]) != len(rows):
+        _table_cache[table] = {"signature": _table_signature(table), "rows": rows, "indexes": {}}
+        return
+    old_rows = entry["rows"]
+    bulk = len(changed) > max(BULK_APPEND_REINDEX_ROWS, len(rows) // 20)
+    for index_name, index in list(entry["indexes"].items()):
+        build, add, update = _table_indexes[index_name]
+        if update is None:
+            del entry["indexes"][index_name]
+        elif bulk and index_name not in _patched_in_bulk:
+            entry["indexes"][index_name] = build(rows)
+        else:
+            for position, new_row in changed.items():
+                update(index, old_rows[position], new_row, position)
+    entry["rows"] = rows
+    entry["signature"] = _table_signature(table)
+
+def _append_rows(table, rows):
+    """Appends rows to a table in storage and patches the cache. Returns True on success."""
+    storage = get_storage()
+    with locked_table(table):
+        pre_signature = _table_signature(table)
+        appended = storage.append_rows(table, rows)
+        if appended:
+            _sync_cache_after_append(table, pre_signature, [dict(row) for row in rows])
+        else:
+            invalidate_table_cache(table)
+        return appended
+
+@_holds_cache_lock
+def _find_row(table, field, value):
+    """Returns a copy of the first stored row whose field equals value, or None.
+       Served by the engine when it has indexed lookups, otherwise by the cached
+       "<table>.<field>" index.
+    """
+    storage = get_storage()
+    if storage.indexed_lookups:
+        rows = storage.find_rows(table, field, value)
+        return rows[0] if rows else None
+    position = _cached_index(table, f"{table}.{field}").get(str(value))
+    if position is None:
+        return None
+    return dict(_cached_rows(table)[position])
+
+def _replace_row(table, new_row):
+    """Replaces the stored row with the same ID (a point update when the engine
+       supports it, otherwise a rewrite of the cached table).
+    """
+    storage = get_storage()
+    with locked_table(table):
+        pre_signature = _table_signature(table)
+        position = None
+        if not storage.point_updates or _current_entry(table, pre_signature) is not None:
+            position = _cached_index(table, f"{table}.id").get(str(new_row.get("id")))
+        if storage.point_updates:
+            replaced = storage.update_row(table, new_row)
+        elif position is None:
+            replaced = False
+        else:
+            rows = _cached_rows(table)
+            replaced = storage.overwrite_rows(table, rows[:position] + [new_row] + rows[position + 1:])
+        if replaced and position is not None:
+            _sync_cache_after_update(table, pre_signature, position, dict(new_row))
+        else:
+            invalidate_table_cache(table)
+        return replaced
+
+def _overwrite_table(table, rows, changed=None):
+    """Replaces a table's stored content with rows in one atomic write and
+       makes them the cached copy. Pass changed {position: new row} when only
+       those rows differ from the cached ones, so the indexes are patched instead
+       of rebuilt. Returns True on success.
+    """
+    storage = get_storage()
+    with locked_table(table):
+        pre_signature = _table_signature(table)
+        if not storage.overwrite_rows(table, rows):
+            invalidate_table_cache(table)
+            return False
+        if changed is None:
+            _table_cache[table] = {"signature": _table_signature(table), "rows": rows, "indexes": {}}
+        else:
+            _sync_cache_after_rewrite(table, pre_signature, rows, changed)
+        return True
+
+def _select_rows(table, field, value):
+    """Returns copies of all stored rows whose field equals value."""
+    storage = get_storage()
+    if storage.indexed_lookups:
+        return storage.find_rows(table, field, value)
+    return [dict(row) for row in _load_rows(table) if row.get(field) == str(value)]
+
+@_holds_cache_lock
+def _max_table_id(table):
+    """Returns the largest numeric ID stored in a table (0 when empty)."""
+    storage = get_storage()
+    if storage.indexed_lookups:
+        return storage.max_id(table)
+    max_id = 0
+    for row in _cached_rows(table):
+        try:
+            max_id = max(max_id, int(row.get("id", 0)))
+        except (ValueError, TypeError):
+            print(f"Warning: Skipping row with invalid ID format: {row.get('id')}")
+    return max_id
+
+def _field_index(field):
+    """Builds the (build, add, update) callbacks for a unique-key index: field value -> row position.
+       When a value repeats, the first row wins, matching a linear scan.
+    """
+    def build(rows):
+        index = {}
+        for position, row in enumerate(rows):
+            index.setdefault(row.get(field, ""), position)
+        return index
+
+    def add(index, row, position):
+        index.setdefault(row.get(field, ""), position)
+
+    def update(index, old_row, new_row, position):
+        old_value, new_value = old_row.get(field, ""), new_row.get(field, "")
+        if old_value != new_value:
+            if index.get(old_value) == position:
+                del index[old_value]
+            index.setdefault(new_value, position)
+
+    return build, add, update
+
+_table_indexes["citizens.id"] = _field_index("id")
+_table_indexes["citizens.national_id"] = _field_index("national_id")
+_table_indexes["admins.username"] = _field_index("username")
+
+def _build_aid_status(rows):
+    """Builds the aid status index in one pass: citizens with a received entry
+       (empty next_date) and the next_date of each citizen's latest entry.
+    """
+    status = {"received": set(), "latest_next_date": {}}
+    for position, row in enumerate(rows):
+        _add_aid_status(status, row, position)
+    return status
+
+def _add_aid_status(status, row, position):
+    citizen_id = row.get("citizen_internal_id", "")
+    next_date = row.get("next_date", "").strip()
+    if next_date == "":
+        status["received"].add(citizen_id)
+    status["latest_next_date"][citizen_id] = next_date
+
+# Which entry is a citizen's latest depends on every row, so an update rebuilds these indexes
+_table_indexes["aid_history.status"] = (_build_aid_status, _add_aid_status, None)
+
+def _sorted_index(key, include=None):
+    """Builds the (build, add, update) callbacks for a sorted index: a list of key
+       tuples in order, each ending with the row position. Rows whose key cannot be
+       computed, or that include(row) rejects, are left out.
+    """
+    def entry(row, position):
+        if include is not None and not include(row):
+            return None
+        try:
+            return key(row) + (position,)
+        except (ValueError, TypeError):
+            return None
+
+    def build(rows):
+        return sorted(e for e in (entry(row, position) for position, row in enumerate(rows)) if e is not None)
+
+    def add(index, row, position):
+        e = entry(row, position)
+        if e is not None:
+            bisect.insort(index, e)
 
-    return next_id
+    def update(index, old_row, new_row, position):
+        old = entry(old_row, position)
+        if old is not None:
+            i = bisect.bisect_left(index, old)
+            if i < len(index) and index[i] == old:
+                del index[i]
+        add(index, new_row, position)
+
+    return build, add, update
+
+# Sort orders offered by get_citizens_page(), the same as get_citizens_list_csv().
+# Ties fall back to table order, like the stable sort there.
+CITIZEN_SORT_KEYS = {
+    "priority_score": lambda row: (-float(row.get("priority_score", 0.0)),),
+    "id": lambda row: (int(row.get("id", 0)),),
+    "full_name": lambda row: (row.get("full_name", ""),),
+    "table": lambda row: (),
+}
+for _sort_by, _key in CITIZEN_SORT_KEYS.items():
+    _table_indexes[f"citizens.order.{_sort_by}"] = _sorted_index(_key)
+
+def _is_active_row(row):
+    return row.get("is_active", "True").strip().lower() == "true"
+
+# Active citizens only, highest score first; backs top_k_by_priority()
+_table_indexes["citizens.active_by_priority"] = _sorted_index(CITIZEN_SORT_KEYS["priority_score"], _is_active_row)
+
+def citizen_record(row):
+    """Returns a typed copy of a raw citizen row, without the secret code hash.
+       Raises ValueError or TypeError if a numeric field cannot be read.
+    """
+    citizen = dict(row)
+    citizen.pop("secret_code_hash", None)
+    citizen["id"] = int(citizen.get("id", 0))
+    citizen["priority_score"] = float(citizen.get("priority_score", 0.0))
+    citizen["household_members"] = int(citizen.get("household_members", 0))
+    citizen["dependents"] = int(citizen.get("dependents", 0))
+    is_active_str = citizen.get("is_active", "True")
+    citizen["is_active"] = is_active_str.strip().lower() == "true"
+    return citizen
+
+@_holds_cache_lock
+def read_citizens():
+    """Returns all citizen rows (as stored) from the shared citizen table cache."""
+    return [dict(row) for row in _cached_rows("citizens")]
+
+def find_citizen_by_national_id(national_id, active_only=False):
+    """Returns a copy of the stored row for a National ID, or None if there is no such citizen."""
+    citizen = _find_row("citizens", "national_id", national_id)
+    if citizen is None:
+        return None
+    if active_only and not _is_active_row(citizen):
+        return None
+    return citizen
+
+def reserve_ids(table, count=1):
+    """Reserves count consecutive IDs in a table's persistent sequence and returns
+       the first one, or None if the sequence could not be advanced.
+    """
+    try:
+        return get_storage().reserve_ids(table, count)
+    except Exception as e:
+        print(f"Error reserving IDs for {table}: {e}")
+        return None
+
+def get_next_citizen_id_csv():
+    """Allocates the next citizen ID from the citizen ID counter."""
+    return reserve_ids("citizens")
 
 def get_next_id_for_table(csv_file, fieldnames):
     """Generic function to get next ID for any table."""
+    table = _table_for_file(csv_file)
+    if table is not None:
+        return reserve_ids(table)
     max_id = 0
     try:
         for row in read_csv_dict(csv_file, fieldnames):
@@ -154,94 +1162,38 @@ def get_next_id_for_table(csv_file, fieldnames):
     return max_id + 1
 
 def setup_csv_files():
-    """Creates data files if they don't exist."""
-    files_to_setup = {
-        CITIZENS_CSV_FILE: CITIZENS_FIELDNAMES,
-        ADMINS_CSV_FILE: ADMINS_FIELDNAMES,
-        AID_HISTORY_CSV_FILE: AID_HISTORY_FIELDNAMES,
-        MESSAGES_CSV_FILE: MESSAGES_FIELDNAMES
-    }
-    
-    for file_path, fieldnames in files_to_setup.items():
-        if not os.path.isfile(file_path):
-            try:
-                os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
-                with open(file_path, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                print(f"Created {file_path} with headers: {fieldnames}")
-            except IOError as e:
-                print(f"Error creating {file_path}: {e}")
-                
-    if not os.path.exists(ID_COUNTER_FILE):
-        try:
-            with open(ID_COUNTER_FILE, "w") as f:
-                f.write("0")
-            print(f"Created and initialized {ID_COUNTER_FILE}")
-        except IOError as e:
-            print(f"Error creating {ID_COUNTER_FILE}: {e}")
-             
+    """Creates the data files (or other storage) if they don't exist."""
+    get_storage().setup()
     print("CSV File setup check complete.")
 
 # Authentication Module Operations
 def verify_admin_login_csv(username, password):
-    """Checks admin credentials by reading the admins CSV file."""
-    password_hash = _hash_password(password)
-    for admin in read_csv_dict(ADMINS_CSV_FILE, ADMINS_FIELDNAMES):
-        if admin.get("username") == username and admin.get("password_hash") == password_hash:
-            return admin
+    """Checks admin credentials: one username lookup and a constant-time hash compare."""
+    admin = _find_row("admins", "username", username)
+    if admin and verify_secret(password, admin.get("password_hash", "")):
+        return admin
     return None
 
 def verify_citizen_login_csv(national_id, secret_code):
     """Checks citizen credentials using national_id and secret_code."""
-    provided_hash = _hash_password(secret_code)
-    for citizen in read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES):
-        is_active_str = citizen.get("is_active", "True")
-        is_active = is_active_str.strip().lower() == "true"
-        stored_hash = citizen.get("secret_code_hash", "")
-        
-        if (citizen.get("national_id") == national_id and 
-            stored_hash == provided_hash and
-            is_active):
-            try:
-                citizen["id"] = int(citizen["id"])
-                citizen["priority_score"] = float(citizen.get("priority_score", 0.0))
-                citizen["household_members"] = int(citizen.get("household_members", 0))
-                citizen["dependents"] = int(citizen.get("dependents", 0))
-                citizen["is_active"] = True
-                if "secret_code_hash" in citizen: 
-                    del citizen["secret_code_hash"]
-            except (ValueError, TypeError):
-                print(f"Warning: Conversion error during login check for citizen ID {citizen.get('id')}")
+    citizen = find_citizen_by_national_id(national_id, active_only=True)
+    if citizen and verify_secret(secret_code, citizen.get("secret_code_hash", "")):
+        try:
+            return citizen_record(citizen)
+        except (ValueError, TypeError):
+            print(f"Warning: Conversion error during login check for citizen ID {citizen.get('id')}")
+            del citizen["secret_code_hash"]
             return citizen
     return None
 
 # Citizen Registration Module Operations
 def check_citizen_exists_csv(national_id):
     """Checks if a citizen with the given National ID already exists."""
-    for citizen in read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES):
-        if citizen.get("national_id") == national_id:
-            return True
-    return False
-
-def register_citizen_csv(citizen_data):
-    """Registers a new citizen by appending to the citizens CSV file."""
-    if "national_id" not in citizen_data or "secret_code" not in citizen_data or "full_name" not in citizen_data:
-        print("Error: Registration requires at least national_id, full_name, and secret_code.")
-        return None
-        
-    if check_citizen_exists_csv(citizen_data["national_id"]):
-        print(f"Error: Citizen with National ID {citizen_data['national_id']} already exists.")
-        return None
-
-    new_id = get_next_citizen_id_csv()
-    if new_id is None:
-        print("Critical Error: Could not generate a unique citizen ID.")
-        return None
+    return _find_row("citizens", "national_id", national_id) is not None
 
-    secret_hash = _hash_password(citizen_data["secret_code"])
-
-    new_record = {
+def _new_citizen_record(new_id, citizen_data):
+    """Builds the stored row for a new citizen, hashing the secret code."""
+    return {
         "id": str(new_id),
         "national_id": citizen_data["national_id"],
         "full_name": citizen_data["full_name"],
@@ -254,99 +1206,337 @@ def register_citizen_csv(citizen_data):
         "priority_score": str(citizen_data.get("priority_score", 0.0)),
         "is_active": "True",
         "registration_date": datetime.datetime.now().isoformat(),
-        "secret_code_hash": secret_hash
+        "secret_code_hash": hash_secret(citizen_data["secret_code"])
     }
 
-    if append_csv_dict(CITIZENS_CSV_FILE, new_record, CITIZENS_FIELDNAMES):
-        print(f"Successfully registered citizen with ID: {new_id}")
-        del new_record["secret_code_hash"]
-        return new_record
-    else:
-        print("Error: Failed to append citizen data to CSV file.")
+def register_citizen_csv(citizen_data):
+    """Registers a new citizen by appending to the citizens CSV file."""
+    if "national_id" not in citizen_data or "secret_code" not in citizen_data or "full_name" not in citizen_data:
+        print("Error: Registration requires at least national_id, full_name, and secret_code.")
         return None
 
+    # Hold the table from the duplicate check to the append so a concurrent
+    # registration cannot slip in the same National ID
+    with locked_table("citizens"):
+        if check_citizen_exists_csv(citizen_data["national_id"]):
+            print(f"Error: Citizen with National ID {citizen_data['national_id']} already exists.")
+            return None
+
+        new_id = get_next_citizen_id_csv()
+        if new_id is None:
+            print("Critical Error: Could not generate a unique citizen ID.")
+            return None
+
+        new_record = _new_citizen_record(new_id, citizen_data)
+
+        if _append_rows("citizens", [new_record]):
+            print(f"Successfully registered citizen with ID: {new_id}")
+            del new_record["secret_code_hash"]
+            return new_record
+        else:
+            print("Error: Failed to append citizen data to storage.")
+            return None
+
+def register_citizens_bulk(citizens_data):
+    """Registers many citizens with one duplicate check, one ID range and one append.
+       Rows missing required fields or reusing a National ID (already stored or
+       earlier in the same batch) are rejected; the rest are registered.
+       Returns (registered_records, rejected) where rejected is a list of
+       {"row": position in the input, "national_id": ..., "reason": ...}.
+    """
+    with locked_table("citizens"):
+        known_national_ids = set(_cached_index("citizens", "citizens.national_id"))
+        accepted = []
+        rejected = []
+        for position, citizen_data in enumerate(citizens_data):
+            national_id = str(citizen_data.get("national_id", "")).strip()
+            if not national_id or not citizen_data.get("full_name") or citizen_data.get("secret_code") in (None, ""):
+                rejected.append({"row": position, "national_id": national_id,
+                                 "reason": "Registration requires at least national_id, full_name, and secret_code."})
+                continue
+            if national_id in known_national_ids:
+                rejected.append({"row": position, "national_id": national_id,
+                                 "reason": f"Citizen with National ID {national_id} already exists."})
+                continue
+            known_national_ids.add(national_id)
+            accepted.append(dict(citizen_data, national_id=national_id, secret_code=str(citizen_data["secret_code"])))
+
+        if not accepted:
+            return [], rejected
+
+        first_id = reserve_ids("citizens", len(accepted))
+        if first_id is None:
+            print("Critical Error: Could not generate unique citizen IDs.")
+            return [], rejected + [{"row": None, "national_id": "", "reason": "Could not generate citizen IDs."}]
+        new_records = [_new_citizen_record(first_id + offset, citizen_data)
+                       for offset, citizen_data in enumerate(accepted)]
+
+        if not _append_rows("citizens", new_records):
+            print("Error: Failed to append citizen data to storage.")
+            return [], rejected + [{"row": None, "national_id": "", "reason": "Failed to write the new citizens."}]
+
+        print(f"Successfully registered {len(new_records)} citizens (IDs {first_id}-{first_id + len(new_records) - 1}).")
+        for record in new_records:
+            del record["secret_code_hash"]
+        return new_records, rejected
+
 def register_admin_csv(username, password, full_name="", organization_id="", role="admin"):
     """Registers a new admin by appending to the admins CSV file."""
-    # Check if admin already exists
-    for admin in read_csv_dict(ADMINS_CSV_FILE, ADMINS_FIELDNAMES):
-        if admin.get("username") == username:
+    with locked_table("admins"):
+        # Check if admin already exists
+        if _find_row("admins", "username", username) is not None:
             print(f"Error: Admin with username {username} already exists.")
             return False
 
-    new_id = get_next_id_for_table(ADMINS_CSV_FILE, ADMINS_FIELDNAMES)
-    password_hash = _hash_password(password)
+        new_id = get_next_id_for_table(ADMINS_CSV_FILE, ADMINS_FIELDNAMES)
+        password_hash = hash_secret(password)
 
-    new_admin = {
-        "id": str(new_id),
+        new_admin = {
+            "id": str(new_id),
         
-        "username": username,
-        "password_hash": password_hash,
-        "full_name": full_name,
-        "organization_id": organization_id,
-        "role": role
-    }
+            "username": username,
+            "password_hash": password_hash,
+            "full_name": full_name,
+            "organization_id": organization_id,
+            "role": role
+        }
 
-    if append_csv_dict(ADMINS_CSV_FILE, new_admin, ADMINS_FIELDNAMES):
-        print(f"Successfully registered admin with ID: {new_id}")
-        return True
-    else:
-        print("Error: Failed to append admin data to CSV file.")
-        return False
+        if _append_rows("admins", [new_admin]):
+            print(f"Successfully registered admin with ID: {new_id}")
+            return True
+        else:
+            print("Error: Failed to append admin data to storage.")
+            return False
 
 def update_citizen_details_csv(citizen_id, updated_data):
-    """Updates a citizen's record by rewriting the entire CSV file.
+    """Updates a citizen's record (an indexed point update in SQLite, a change log append for CSV).
        Uses internal ID (auto-incremented).
        Handles data type conversion back to string for storage.
     """
     print(f"CSV file path: {CITIZENS_CSV_FILE}") 
-    all_citizens_dicts = list(read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES)) # Read all into memory
-    updated = False
-    citizen_found = False
-    str_citizen_id = str(citizen_id)
-
-    for i, citizen_dict in enumerate(all_citizens_dicts):
-        if citizen_dict.get("id") == str_citizen_id:
-            citizen_found = True
-            # Check for National ID uniqueness if it's being updated
-            if "national_id" in updated_data and updated_data["national_id"] != citizen_dict.get("national_id"):
-                new_nat_id = updated_data["national_id"]
-                for other_citizen in all_citizens_dicts:
-                    # Ensure we don't compare the citizen to itself
-                    if other_citizen.get("id") != str_citizen_id and other_citizen.get("national_id") == new_nat_id:
-                        print(f"Error: New National ID {new_nat_id} already exists for another citizen (ID: {other_citizen.get('id')}).")
-                        return False # Prevent update
-            
-            # Update the dictionary - convert values back to string where necessary
+    with locked_table("citizens"):
+        str_citizen_id = str(citizen_id)
+        citizen_dict = _find_row("citizens", "id", str_citizen_id)
+
+        if citizen_dict is None:
+            print(f"Error: Citizen with ID {citizen_id} not found for update.")
+            return False
+
+        # Check for National ID uniqueness if it's being updated
+        if "national_id" in updated_data and updated_data["national_id"] != citizen_dict.get("national_id"):
+            new_nat_id = str(updated_data["national_id"])
+            other_citizen = _find_row("citizens", "national_id", new_nat_id)
+            # Ensure we don't compare the citizen to itself
+            if other_citizen is not None and other_citizen.get("id") != str_citizen_id:
+                print(f"Error: New National ID {new_nat_id} already exists for another citizen (ID: {other_citizen.get('id')}).")
+                return False # Prevent update
+
+        # Update the dictionary - convert values back to string where necessary
+        updated = False
+        for key, value in updated_data.items():
+            if key in CITIZENS_FIELDNAMES and key != "id":
+                # Convert numbers/booleans back to string for storage
+                if value is None: # Handle None values if necessary
+                    citizen_dict[key] = "" # Store as empty string
+                else:
+                    citizen_dict[key] = str(value)
+                updated = True
+        # Note: Score recalculation based on updated fields might be needed here.
+
+        if not updated:
+             print(f"No valid changes applied for citizen {citizen_id}.")
+             return True # No changes needed, considered success
+
+        if _replace_row("citizens", citizen_dict):
+            print(f"Successfully updated details for citizen {citizen_id}.")
+            return True
+        else:
+            print(f"Error: Failed to write citizen {citizen_id} during update.")
+            return False
+
+def update_citizens_bulk(changes_by_id):
+    """Applies {citizen_id: updated_data} to many citizens with a single rewrite.
+       National ID changes are checked for uniqueness against the whole table and
+       the rest of the batch; swapping IDs between citizens in one batch is rejected.
+       Returns {citizen_id: {"success": bool, "message": str}} for every requested ID.
+    """
+    with locked_table("citizens"):
+        rows = _cached_rows("citizens")
+        id_index = _cached_index("citizens", "citizens.id")
+        report = {}
+        batch = {}  # position -> (citizen_id, updated row)
+
+        for citizen_id, updated_data in changes_by_id.items():
+            position = id_index.get(str(citizen_id))
+            if position is None:
+                report[citizen_id] = {"success": False, "message": f"Citizen with ID {citizen_id} not found."}
+                continue
+            if position in batch:
+                report[citizen_id] = {"success": False, "message": f"Citizen {citizen_id} is listed more than once."}
+                continue
+            citizen_dict = dict(rows[position])
             for key, value in updated_data.items():
-                if key in CITIZENS_FIELDNAMES:
-                    # Convert numbers/booleans back to string for CSV storage
-                    if isinstance(value, (int, float)):
-                        all_citizens_dicts[i][key] = str(value)
-                    elif isinstance(value, bool):
-                        all_citizens_dicts[i][key] = str(value)
-                    elif value is None: # Handle None values if necessary
-                         all_citizens_dicts[i][key] = "" # Store as empty string
-                    else:
-                        all_citizens_dicts[i][key] = str(value) # Convert others to string just in case
-            updated = True
-            # Note: Score recalculation based on updated fields might be needed here.
-            break # Found and updated
-
-    if not citizen_found:
-        print(f"Error: Citizen with ID {citizen_id} not found for update.")
-        return False
-        
-    if not updated:
-         print(f"No valid changes applied for citizen {citizen_id}.")
-         return True # No changes needed, considered success
+                if key in CITIZENS_FIELDNAMES and key != "id":
+                    citizen_dict[key] = "" if value is None else str(value)
+            batch[position] = (citizen_id, citizen_dict)
 
-    # Rewrite the entire file
-    if overwrite_csv_dict(CITIZENS_CSV_FILE, all_citizens_dicts, CITIZENS_FIELDNAMES):
-        print(f"Successfully updated details for citizen {citizen_id} by rewriting CSV.")
-        return True
+        # National IDs held after the batch: everyone outside it, batch rows that keep
+        # theirs, and the old IDs of batch rows that change theirs
+        taken = {row.get("national_id") for position, row in enumerate(rows) if position not in batch}
+        for position, (citizen_id, citizen_dict) in batch.items():
+            taken.add(rows[position].get("national_id"))
+        changed = {}
+        for position, (citizen_id, citizen_dict) in sorted(batch.items()):
+            new_nat_id = citizen_dict.get("national_id")
+            if new_nat_id != rows[position].get("national_id"):
+                if new_nat_id in taken:
+                    report[citizen_id] = {"success": False,
+                                          "message": f"National ID {new_nat_id} already exists for another citizen."}
+                    continue
+                taken.add(new_nat_id)
+            if citizen_dict != rows[position]:
+                changed[position] = citizen_dict
+            report[citizen_id] = {"success": True, "message": "Updated." if position in changed else "No changes."}
+
+        if changed:
+            new_rows = [changed.get(position, row) for position, row in enumerate(rows)]
+            if _overwrite_table("citizens", new_rows, changed):
+                print(f"Successfully updated {len(changed)} citizens in one write.")
+            else:
+                print("Error: Failed to write the bulk citizen update.")
+                for position in changed:
+                    report[batch[position][0]] = {"success": False, "message": "Failed to write the update."}
+        return report
+
+# Priority Score Policy
+# recompute_priority_scores() rescores every citizen with:
+#   base + per_household_member * household_members + per_dependent * dependents
+#   + needs_weights[needs_description] (default_need_weight for other needs)
+#   + never_received_bonus if the citizen has not received aid (see check_citizen_received_aid)
+#   - recent_aid_penalty * (1 - days since the last delivered aid / recent_aid_days), while positive
+# An entry counts as delivered aid when it has no next_date and is not dated after today.
+# clipped to [min_score, max_score] and rounded to two decimals.
+DEFAULT_SCORE_POLICY = {
+    "base": 0.0,
+    "per_household_member": 0.3,
+    "per_dependent": 0.5,
+    "needs_weights": {
+        "chronic medication": 3.0,
+        "children supplies": 2.0,
+        "food parcel": 2.0,
+        "rent assistance": 1.5,
+        "financial aid": 1.0,
+    },
+    "default_need_weight": 0.0,
+    "never_received_bonus": 2.0,
+    "recent_aid_penalty": 3.0,
+    "recent_aid_days": 90,
+    "min_score": 0.0,
+    "max_score": 10.0,
+}
+
+def _parse_aid_date(value, day_first=False):
+    parsed = parse_date_text(value, day_first)
+    return parsed.date() if parsed else None
+
+def _days_since_last_aid(today):
+    """Returns {citizen ID: days since their latest delivered aid}. Pending entries
+       (with a next_date) and entries dated after today are left out.
+    """
+    last_dates = {}
+    for row in _cached_rows("aid_history"):
+        if row.get("next_date", "").strip():
+            continue
+        aid_date = _parse_aid_date(row.get("date", ""), day_first=True)
+        if aid_date is None or aid_date > today:
+            continue
+        citizen_id = row.get("citizen_internal_id", "")
+        if citizen_id not in last_dates or aid_date > last_dates[citizen_id]:
+            last_dates[citizen_id] = aid_date
+    return {citizen_id: (today - aid_date).days for citizen_id, aid_date in last_dates.items()}
+
+def _policy_scores(policy, household, dependents, need_weight, days_since):
+    """Evaluates the score formula. Takes NumPy arrays (one element per citizen) or
+       plain numbers; days_since is infinite for citizens who never received aid.
+    """
+    if np is not None and isinstance(household, np.ndarray):
+        clip, round_to = np.clip, np.round
     else:
-        print(f"Error: Failed to rewrite {CITIZENS_CSV_FILE} during update.")
-        return False
+        clip, round_to = (lambda value, low, high: min(max(value, low), high)), round
+    recency = clip(1 - days_since / policy["recent_aid_days"], 0, 1)
+    score = (policy["base"] + policy["per_household_member"] * household + policy["per_dependent"] * dependents
+             + need_weight + policy["never_received_bonus"] * (days_since == float("inf"))
+             - policy["recent_aid_penalty"] * recency)
+    return round_to(clip(score, policy["min_score"], policy["max_score"]), 2)
+
+def recompute_priority_scores(policy=None, dry_run=False):
+    """Rescores all citizens with a scoring policy (see Priority Score Policy; keys
+       left out use DEFAULT_SCORE_POLICY) and writes every new score in one atomic
+       table rewrite. Rows with unreadable numbers keep their score. With dry_run the
+       scores are only computed. Returns a report of how the scores shifted, or None
+       if the write failed.
+    """
+    policy = {**DEFAULT_SCORE_POLICY, **(policy or {})}
+    needs_weights = {need.strip().lower(): weight for need, weight in policy["needs_weights"].items()}
+    today = datetime.date.today()
+
+    with locked_table("citizens"):
+        rows = _cached_rows("citizens")
+        days_by_id = _days_since_last_aid(today)
+        received_ids = _aid_status()["received"]
+        positions, old_scores, household, dependents, need_weight, days_since = [], [], [], [], [], []
+        for position, row in enumerate(rows):
+            try:
+                values = (float(row.get("priority_score", 0.0)), int(row.get("household_members", 0)),
+                          int(row.get("dependents", 0)), int(row.get("id", 0)))
+            except (ValueError, TypeError):
+                continue
+            positions.append(position)
+            old_scores.append(values[0])
+            household.append(values[1])
+            dependents.append(values[2])
+            need = row.get("needs_description", "").strip().lower()
+            need_weight.append(needs_weights.get(need, policy["default_need_weight"]))
+            citizen_id = row.get("id", "")
+            if citizen_id not in received_ids:
+                days_since.append(float("inf"))
+            else:
+                # Received, but no delivery date to go by: no recent aid penalty
+                days_since.append(days_by_id.get(citizen_id, policy["recent_aid_days"]))
+
+        if np is not None:
+            new_scores = _policy_scores(policy, np.array(household, dtype=float), np.array(dependents, dtype=float),
+                                        np.array(need_weight, dtype=float), np.array(days_since, dtype=float))
+            new_scores = new_scores.tolist()
+        else:
+            new_scores = [_policy_scores(policy, *values)
+                          for values in zip(household, dependents, need_weight, days_since)]
+
+        shifts = [(new - old, rows[position]["id"]) for position, old, new in zip(positions, old_scores, new_scores)]
+        report = {
+            "citizens": len(positions),
+            "skipped": len(rows) - len(positions),
+            "changed": sum(1 for shift, _ in shifts if shift != 0),
+            "raised": sum(1 for shift, _ in shifts if shift > 0),
+            "lowered": sum(1 for shift, _ in shifts if shift < 0),
+            "mean_before": round(sum(old_scores) / len(old_scores), 2) if old_scores else 0.0,
+            "mean_after": round(sum(new_scores) / len(new_scores), 2) if new_scores else 0.0,
+            "mean_abs_shift": round(sum(abs(shift) for shift, _ in shifts) / len(shifts), 2) if shifts else 0.0,
+            "largest_increases": [(int(i), round(shift, 2)) for shift, i in heapq.nlargest(5, shifts) if shift > 0],
+            "largest_decreases": [(int(i), round(shift, 2)) for shift, i in heapq.nsmallest(5, shifts) if shift < 0],
+            "dry_run": dry_run,
+        }
+        if dry_run or not report["changed"]:
+            return report
+
+        changed = {position: dict(rows[position], priority_score=str(score))
+                   for position, old, score in zip(positions, old_scores, new_scores) if old != score}
+        new_rows = [changed.get(position, row) for position, row in enumerate(rows)]
+        if not _overwrite_table("citizens", new_rows, changed):
+            print("Error: Failed to write the recomputed priority scores.")
+            return None
+    print(f"Recomputed priority scores: {report['changed']} of {report['citizens']} citizens changed.")
+    return report
 
 # --- Keep existing .txt file operations for aid_history and messages ---
 # These were not part of the original csv_based_operations_examples.py
@@ -376,30 +1566,169 @@ def save_message_entry(citizen_internal_id, message):
         print(f"Error writing to messages.txt: {e}")
         return False
 # Dashboard Operations
+# Citizen Filters
+# filter_criteria maps a field to a condition; a citizen must meet all of them:
+#   {"field": value}                 equality on the typed field
+#   {"field": [value, value, ...]}   any of the values
+#   {"field": {"min": a, "max": b}}  inclusive range (either bound may be left out)
+# Besides the stored fields there are two derived ones: "region", the part of the
+# address after " - " (e.g. "North Gaza"), and "received_aid" (True/False).
+# region and needs_description compare case-insensitively. The most selective
+# indexed condition picks the rows to check, so narrow filters avoid a full scan.
+CITIZEN_RANGE_FIELDS = ("priority_score", "household_members", "dependents")
+CITIZEN_TEXT_FIELDS = ("region", "needs_description")
+
+def citizen_region(address):
+    """Returns the region suffix of an address ("Al-Sabra - Gaza" -> "Gaza")."""
+    return address.rsplit(" - ", 1)[1].strip() if " - " in address else ""
+
+def _group_index(value_of):
+    """Builds the (build, add, update) callbacks for a value -> set of row positions index."""
+    def build(rows):
+        index = {}
+        for position, row in enumerate(rows):
+            add(index, row, position)
+        return index
+
+    def add(index, row, position):
+        index.setdefault(value_of(row), set()).add(position)
+
+    def update(index, old_row, new_row, position):
+        index.get(value_of(old_row), set()).discard(position)
+        add(index, new_row, position)
+
+    return build, add, update
+
+_table_indexes["citizens.region"] = _group_index(lambda row: citizen_region(row.get("address", "")).lower())
+_table_indexes["citizens.needs_description"] = _group_index(lambda row: row.get("needs_description", "").strip().lower())
+for _field in CITIZEN_RANGE_FIELDS:
+    _table_indexes[f"citizens.range.{_field}"] = _sorted_index(lambda row, field=_field: (float(row.get(field, 0)),))
+
+def _filter_value(citizen, field, received_ids):
+    if field == "region":
+        return citizen_region(citizen.get("address", "")).lower()
+    if field == "needs_description":
+        return citizen.get("needs_description", "").strip().lower()
+    if field == "received_aid":
+        return str(citizen.get("id")) in received_ids
+    return citizen.get(field)
+
+def _normalize_condition(field, condition):
+    """Lower-cases the values of text conditions so they match _filter_value()."""
+    if field not in CITIZEN_TEXT_FIELDS:
+        return condition
+    if isinstance(condition, (list, tuple, set)):
+        return [str(value).strip().lower() for value in condition]
+    return str(condition).strip().lower()
+
+def _condition_matches(value, condition):
+    try:
+        if isinstance(condition, dict):
+            return (value is not None and
+                    (condition.get("min") is None or value >= condition["min"]) and
+                    (condition.get("max") is None or value <= condition["max"]))
+        if isinstance(condition, (list, tuple, set)):
+            return value in condition
+        return value == condition
+    except TypeError:
+        return False
+
+def _citizen_matches(citizen, filter_criteria, received_ids=None):
+    """Checks a typed citizen record against filter_criteria (see Citizen Filters)."""
+    for field, condition in filter_criteria.items():
+        value = _filter_value(citizen, field, received_ids or set())
+        if not _condition_matches(value, _normalize_condition(field, condition)):
+            return False
+    return True
+
+def _index_plan(field, condition):
+    """Returns (estimated matches, fetch positions) for a condition an index can
+       answer, or None when the condition has to be checked row by row.
+    """
+    if field in CITIZEN_TEXT_FIELDS and not isinstance(condition, dict):
+        index = _cached_index("citizens", f"citizens.{field}")
+        values = _normalize_condition(field, condition)
+        buckets = [index.get(value, set()) for value in (values if isinstance(values, list) else [values])]
+        return sum(len(bucket) for bucket in buckets), lambda: set().union(*buckets)
+
+    if field in CITIZEN_RANGE_FIELDS and not isinstance(condition, (list, tuple, set)):
+        low, high = (condition.get("min"), condition.get("max")) if isinstance(condition, dict) else (condition, condition)
+        try:
+            order = _cached_index("citizens", f"citizens.range.{field}")
+            start = bisect.bisect_left(order, (float(low),)) if low is not None else 0
+            end = bisect.bisect_right(order, (float(high), float("inf"))) if high is not None else len(order)
+        except (ValueError, TypeError):
+            return None
+        return max(0, end - start), lambda: {key[-1] for key in order[start:end]}
+
+    if field == "received_aid" and condition is True:
+        received_ids = _aid_status()["received"]
+        id_index = _cached_index("citizens", "citizens.id")
+        return len(received_ids), lambda: {id_index[i] for i in received_ids if i in id_index}
+
+    if field in ("id", "national_id") and not isinstance(condition, (dict, list, tuple, set)):
+        position = _cached_index("citizens", f"citizens.{field}").get(str(condition))
+        return (0, set) if position is None else (1, lambda: {position})
+
+    return None
+
+def _candidate_positions(filter_criteria):
+    """Returns the positions of the citizen rows that can match filter_criteria,
+       taken from the most selective indexed condition, or None when a full scan is
+       cheaper. Candidates still have to be checked with _citizen_matches().
+    """
+    best = None
+    for field, condition in filter_criteria.items():
+        plan = _index_plan(field, condition)
+        if plan is not None and (best is None or plan[0] < best[0]):
+            best = plan
+    if best is None or best[0] > len(_cached_rows("citizens")) // 2:
+        return None
+    return best[1]()
+
+def _filter_received_ids(filter_criteria):
+    """The received-aid set, fetched once per query and only when a filter needs it."""
+    return _aid_status()["received"] if filter_criteria and "received_aid" in filter_criteria else None
+
+def _filtered_order(sort_by, filter_criteria):
+    """Returns the sorted index keys to walk for a listing: the whole cached order,
+       or just the index-selected candidates sorted the same way.
+    """
+    positions = _candidate_positions(filter_criteria) if filter_criteria else None
+    if positions is None:
+        return _cached_index("citizens", f"citizens.order.{sort_by}")
+    rows = _cached_rows("citizens")
+    key = CITIZEN_SORT_KEYS[sort_by]
+    order = []
+    for position in positions:
+        try:
+            order.append(key(rows[position]) + (position,))
+        except (ValueError, TypeError):
+            continue
+    order.sort()
+    return order
+
+@_holds_cache_lock
 def get_citizens_list_csv(sort_by="priority_score", filter_criteria=None, include_inactive=False):
-    """Reads the entire citizens CSV, filters/sorts in memory."""
+    """Reads the cached citizens table, filters/sorts in memory.
+       filter_criteria is described under Citizen Filters.
+    """
+    rows = _cached_rows("citizens")
+    positions = _candidate_positions(filter_criteria) if filter_criteria else None
+    received_ids = _filter_received_ids(filter_criteria)
     all_citizens = []
-    for row in read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES):
-        if "secret_code_hash" in row: 
-            del row["secret_code_hash"]
-        
+    for cached_row in rows if positions is None else [rows[position] for position in sorted(positions)]:
         try:
-            row["id"] = int(row.get("id", 0))
-            row["priority_score"] = float(row.get("priority_score", 0.0))
-            row["household_members"] = int(row.get("household_members", 0))
-            row["dependents"] = int(row.get("dependents", 0))
-            is_active_str = row.get("is_active", "True")
-            row["is_active"] = is_active_str.strip().lower() == "true"
+            row = citizen_record(cached_row)
         except (ValueError, TypeError):
-            print(f"Warning: Data conversion error for citizen ID {row.get('id')}")
+            print(f"Warning: Data conversion error for citizen ID {cached_row.get('id')}")
             continue
 
         if not include_inactive and not row["is_active"]:
             continue
 
-        if filter_criteria:
-            # Apply custom filter logic here if needed
-            pass
+        if filter_criteria and not _citizen_matches(row, filter_criteria, received_ids):
+            continue
 
         all_citizens.append(row)
 
@@ -413,6 +1742,305 @@ def get_citizens_list_csv(sort_by="priority_score", filter_criteria=None, includ
 
     return all_citizens
 
+def _encode_cursor(sort_by, key):
+    return base64.urlsafe_b64encode(json.dumps([sort_by, list(key)]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor):
+    sort_by, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    return sort_by, tuple(key)
+
+@_holds_cache_lock
+def get_citizens_page(sort_by="priority_score", filter_criteria=None, include_inactive=False, limit=30, cursor=None):
+    """Returns one page of citizens in the same order as get_citizens_list_csv(),
+       read from a cached sorted index instead of sorting the whole table.
+       Pass the returned cursor back to get the next page; it is None after the last page.
+       Returns (citizens, next_cursor). Raises ValueError if limit is less than 1.
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}.")
+    if sort_by not in CITIZEN_SORT_KEYS:
+        sort_by = "table"
+    order = _filtered_order(sort_by, filter_criteria)
+    rows = _cached_rows("citizens")
+    received_ids = _filter_received_ids(filter_criteria)
+
+    start = 0
+    if cursor:
+        try:
+            cursor_sort_by, last_key = _decode_cursor(cursor)
+        except (ValueError, TypeError, UnicodeError):
+            print(f"Error: Invalid citizens page cursor: {cursor}")
+            return [], None
+        if cursor_sort_by != sort_by:
+            print(f"Error: Cursor was created for sorting by {cursor_sort_by}, not {sort_by}.")
+            return [], None
+        start = bisect.bisect_right(order, last_key)
+
+    page = []
+    last_key = None
+    i = start - 1  # Position of the last key looked at
+    for i in range(start, len(order)):
+        key = order[i]
+        try:
+            citizen = citizen_record(rows[key[-1]])
+        except (ValueError, TypeError):
+            continue
+        if not include_inactive and not citizen["is_active"]:
+            continue
+        if filter_criteria and not _citizen_matches(citizen, filter_criteria, received_ids):
+            continue
+        page.append(citizen)
+        last_key = key
+        if len(page) >= limit:
+            break
+
+    next_cursor = None
+    if len(page) >= limit and i + 1 < len(order):
+        next_cursor = _encode_cursor(sort_by, last_key)
+    return page, next_cursor
+
+@_holds_cache_lock
+def get_citizen_ids(sort_by="priority_score", filter_criteria=None, include_inactive=False):
+    """Returns the IDs of the citizens get_citizens_list_csv() would return, in the
+       same order, read from the cached sorted index. Lets a screen keep only the
+       IDs of a long list and fetch details for the rows it actually shows.
+    """
+    if sort_by not in CITIZEN_SORT_KEYS:
+        sort_by = "table"
+    rows = _cached_rows("citizens")
+    received_ids = _filter_received_ids(filter_criteria)
+    citizen_ids = []
+    for key in _filtered_order(sort_by, filter_criteria):
+        row = rows[key[-1]]
+        # Only typed filters need the full record; the common case stays on the raw row
+        if not include_inactive and not _is_active_row(row):
+            continue
+        try:
+            if filter_criteria and not _citizen_matches(citizen_record(row), filter_criteria, received_ids):
+                continue
+            citizen_ids.append(int(row.get("id", 0)))
+        except (ValueError, TypeError):
+            continue
+    return citizen_ids
+
+def iter_citizens(sort_by="priority_score", filter_criteria=None, include_inactive=False):
+    """Yields the citizens get_citizens_list_csv() would return, in the same order,
+       one typed record at a time, so long exports never hold a second copy of the table.
+    """
+    if sort_by not in CITIZEN_SORT_KEYS:
+        sort_by = "table"
+    with _cache_lock:  # Not held across yields; the walk uses snapshots instead
+        order = list(_filtered_order(sort_by, filter_criteria))  # Writes during the walk must not shift it
+        rows = _cached_rows("citizens")  # Only ever appended to or patched in place
+        received_ids = _filter_received_ids(filter_criteria)
+        received_ids = None if received_ids is None else set(received_ids)
+    for key in order:
+        try:
+            citizen = citizen_record(rows[key[-1]])
+        except (ValueError, TypeError):
+            continue
+        if not include_inactive and not citizen["is_active"]:
+            continue
+        if filter_criteria and not _citizen_matches(citizen, filter_criteria, received_ids):
+            continue
+        yield citizen
+
+@_holds_cache_lock
+def top_k_by_priority(k):
+    """Returns the k active citizens with the highest priority scores, in the same
+       order as get_citizens_list_csv(sort_by="priority_score"). Read from a sorted
+       index that registrations and updates keep current, so a call costs O(k).
+    """
+    rows = _cached_rows("citizens")
+    top = []
+    for key in _cached_index("citizens", "citizens.active_by_priority"):
+        if len(top) >= k:
+            break
+        try:
+            top.append(citizen_record(rows[key[-1]]))
+        except (ValueError, TypeError):
+            continue
+    return top
+
+# Citizen Search
+# Names and addresses are split into lower-case words. A query word matches any
+# stored word it is a prefix of ("jab" finds "Jabalia"); a word with no prefix
+# match falls back to words that share most of its trigrams, which absorbs typos
+# such as "Jabalya". Every query word must match. Results whose name matches all
+# the words come first, then address matches, each ordered by priority score.
+SEARCH_FUZZY_MIN_LENGTH = 3
+SEARCH_FUZZY_MIN_SIMILARITY = 0.5
+
+def _search_words(text):
+    return re.findall(r"\w+", text.lower())
+
+def _word_trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _search_fields(row):
+    return (("name", _search_words(row.get("full_name", ""))),
+            ("address", _search_words(row.get("address", ""))))
+
+def _build_search_index(rows):
+    index = {"name": {}, "address": {}, "vocab": [], "trigrams": {}}
+    for position, row in enumerate(rows):
+        for field, words in _search_fields(row):
+            postings = index[field]
+            for word in words:
+                postings.setdefault(word, set()).add(position)
+    index["vocab"] = sorted(set(index["name"]) | set(index["address"]))
+    for word in index["vocab"]:
+        for trigram in _word_trigrams(word):
+            index["trigrams"].setdefault(trigram, set()).add(word)
+    return index
+
+def _add_to_search_index(index, row, position):
+    vocab = index["vocab"]
+    for field, words in _search_fields(row):
+        for word in words:
+            index[field].setdefault(word, set()).add(position)
+            i = bisect.bisect_left(vocab, word)
+            if i == len(vocab) or vocab[i] != word:
+                vocab.insert(i, word)
+                for trigram in _word_trigrams(word):
+                    index["trigrams"].setdefault(trigram, set()).add(word)
+
+def _update_search_index(index, old_row, new_row, position):
+    if all(old_row.get(field) == new_row.get(field) for field in ("full_name", "address")):
+        return
+    for field, words in _search_fields(old_row):
+        for word in words:
+            index[field].get(word, set()).discard(position)
+    _add_to_search_index(index, new_row, position)
+
+_table_indexes["citizens.search"] = (_build_search_index, _add_to_search_index, _update_search_index)
+_patched_in_bulk.add("citizens.search")
+
+def warm_search_index():
+    """Builds the citizen search index and the priority order it ranks by ahead of
+       the first query; writes keep both current from then on. The app runs this on
+       its background worker at startup.
+    """
+    _cached_index("citizens", "citizens.search")
+    _cached_index("citizens", "citizens.active_by_priority")
+
+def _matching_words(index, query_word):
+    """Returns the stored words a query word matches, and whether the match is fuzzy."""
+    vocab = index["vocab"]
+    start = bisect.bisect_left(vocab, query_word)
+    end = bisect.bisect_left(vocab, query_word + "\U0010ffff")
+    if start < end or len(query_word) < SEARCH_FUZZY_MIN_LENGTH:
+        return vocab[start:end], False
+
+    query_trigrams = _word_trigrams(query_word)
+    shared = {}
+    for trigram in query_trigrams:
+        for word in index["trigrams"].get(trigram, ()):
+            shared[word] = shared.get(word, 0) + 1
+    words = [word for word, count in shared.items()
+             if 2 * count / (len(query_trigrams) + len(_word_trigrams(word))) >= SEARCH_FUZZY_MIN_SIMILARITY]
+    return words, True
+
+def _top_positions(need, include_inactive, positions=None, accept=None):
+    """Returns up to `need` row positions, highest priority score first, taken from
+       `positions` (every row when None) and passing accept(position). Large or lazy
+       selections are read off the sorted priority index; small ones are ranked directly.
+    """
+    if positions is None or len(positions) > 50 * need:
+        order_name = "citizens.order.priority_score" if include_inactive else "citizens.active_by_priority"
+        top = []
+        for key in _cached_index("citizens", order_name):
+            if len(top) >= need:
+                break
+            position = key[-1]
+            if (positions is None or position in positions) and (accept is None or accept(position)):
+                top.append(position)
+        return top
+    return _rank_positions(positions, need, include_inactive, accept)
+
+def _rank_positions(positions, need, include_inactive, accept=None):
+    """Ranks the given row positions directly, in the priority index's order, and
+       returns the first `need`. Rows the index would leave out are skipped.
+    """
+    rows = _cached_rows("citizens")
+    key = CITIZEN_SORT_KEYS["priority_score"]
+    ranked = []
+    for position in sorted(positions):  # Table order, as ties are broken in the index
+        row = rows[position]
+        if not include_inactive and not _is_active_row(row):
+            continue
+        if accept is not None and not accept(position):
+            continue
+        try:
+            ranked.append(key(row) + (position,))
+        except (ValueError, TypeError):
+            continue
+    return [entry[-1] for entry in heapq.nsmallest(need, ranked)]
+
+def _search_positions(index, fields, word_groups, limit, include_inactive):
+    """Returns up to `limit` positions where every word group has a word in one of
+       `fields`. Selective groups are intersected as sets; groups matching a large
+       share of the table are checked per row while walking the priority order.
+    """
+    sized = []
+    for words in word_groups:
+        postings = sorted((index[field][word] for field in fields for word in words if word in index[field]),
+                          key=len, reverse=True)
+        sized.append((sum(len(p) for p in postings), postings))
+    sized.sort(key=lambda group: group[0])
+
+    total = len(_cached_rows("citizens"))
+    candidates = None
+    deferred = []
+    for size, postings in sized:
+        if candidates is None and size <= total // 4:
+            candidates = set().union(*postings)
+        elif candidates is not None and size <= 2 * len(candidates):
+            candidates &= set().union(*postings)
+        else:
+            deferred.append(postings)
+        if candidates is not None and not candidates:
+            return []
+
+    def accept(position):
+        return all(any(position in p for p in postings) for postings in deferred)
+
+    return _top_positions(limit, include_inactive, candidates, accept if deferred else None)
+
+@_holds_cache_lock
+def search_citizens(query, limit=20, include_inactive=False):
+    """Finds citizens by (partial) name or address words, e.g. "Khan Younis" or
+       "jabalia naz", and returns up to `limit` typed records, best matches first.
+       Served from a word/trigram index that writes keep current, so no table scan
+       is needed per query once it is built (see warm_search_index()).
+    """
+    query_words = list(dict.fromkeys(_search_words(query or "")))
+    if not query_words or limit <= 0:
+        return []
+
+    index = _cached_index("citizens", "citizens.search")
+    word_groups = [_matching_words(index, word)[0] for word in query_words]
+    if not all(word_groups):
+        return []
+
+    top = _search_positions(index, ("name",), word_groups, limit, include_inactive)
+    if len(top) < limit:
+        # Fewer name matches than asked for means `top` holds all of them
+        seen = set(top)
+        top += [position for position in
+                _search_positions(index, ("name", "address"), word_groups, limit, include_inactive)
+                if position not in seen][:limit - len(top)]
+
+    rows = _cached_rows("citizens")
+    results = []
+    for position in top:
+        try:
+            results.append(citizen_record(rows[position]))
+        except (ValueError, TypeError):
+            continue
+    return results
+
 def get_citizen_details_csv(citizen_internal_id):
     """Retrieves detailed information for a specific citizen by internal ID."""
     try:
@@ -421,61 +2049,339 @@ def get_citizen_details_csv(citizen_internal_id):
         print(f"Error: Invalid citizen internal ID format: {citizen_internal_id}")
         return None
 
-    for citizen in read_csv_dict(CITIZENS_CSV_FILE, CITIZENS_FIELDNAMES):
+    citizen = _find_row("citizens", "id", citizen_internal_id)
+    if citizen is not None:
         try:
-            if int(citizen.get("id", 0)) == citizen_internal_id:
-                if "secret_code_hash" in citizen:
-                    del citizen["secret_code_hash"]
-                
-                citizen["id"] = int(citizen["id"])
-                citizen["priority_score"] = float(citizen.get("priority_score", 0.0))
-                citizen["household_members"] = int(citizen.get("household_members", 0))
-                citizen["dependents"] = int(citizen.get("dependents", 0))
-                is_active_str = citizen.get("is_active", "True")
-                citizen["is_active"] = is_active_str.strip().lower() == "true"
-                
-                return citizen
+            return citizen_record(citizen)
         except (ValueError, TypeError):
-            continue
+            pass
     
     print(f"Warning: Citizen with internal ID {citizen_internal_id} not found.")
     return None
 
 # Aid History Operations
 def save_aid_history_entry(citizen_internal_id, entry_type, date_str, next_date_str=""):
-    """Saves an aid history entry to the CSV file."""
+    """Saves an aid history entry to the aid history table. Dates are stored as YYYY-MM-DD."""
+    _cached_rows("aid_history")  # Warm the cache so the append keeps the aid status index current
     new_id = get_next_id_for_table(AID_HISTORY_CSV_FILE, AID_HISTORY_FIELDNAMES)
     
     entry = {
         "id": str(new_id),
         "citizen_internal_id": str(citizen_internal_id),
         "entry_type": entry_type,
-        "date": date_str,
-        "next_date": next_date_str,
+        "date": canonical_date(date_str),
+        "next_date": canonical_date(next_date_str),
         "timestamp": datetime.datetime.now().isoformat()
     }
     
-    return append_csv_dict(AID_HISTORY_CSV_FILE, entry, AID_HISTORY_FIELDNAMES)
+    return _append_rows("aid_history", [entry])
 
+@_holds_cache_lock
 def read_aid_history(citizen_internal_id=None):
-    """Reads aid history entries, optionally filtered by citizen ID."""
-    history = []
-    for entry in read_csv_dict(AID_HISTORY_CSV_FILE, AID_HISTORY_FIELDNAMES):
-        if citizen_internal_id is None or entry.get("citizen_internal_id") == str(citizen_internal_id):
-            history.append(entry)
-    return history
+    """Reads aid history entries, optionally filtered by citizen ID. One citizen's
+       entries come from the engine's per-citizen lookup (a byte-offset index for CSV).
+    """
+    if citizen_internal_id is not None:
+        return get_storage().find_rows("aid_history", "citizen_internal_id", citizen_internal_id)
+    return [dict(entry) for entry in _cached_rows("aid_history")]
+
+def _aid_status():
+    return _cached_index("aid_history", "aid_history.status")
 
+@_holds_cache_lock
+def get_received_aid_ids():
+    """Returns the set of citizen internal IDs (as strings) that have received aid."""
+    return set(_aid_status()["received"])
+
+@_holds_cache_lock
+def get_latest_next_dates():
+    """Returns {citizen internal ID: next_date of the citizen's latest aid entry} ("" once received)."""
+    return dict(_aid_status()["latest_next_date"])
+
+@_holds_cache_lock
 def check_citizen_received_aid(citizen_internal_id):
     """Checks if a citizen has received aid (has entry with empty next_date)."""
-    for entry in read_csv_dict(AID_HISTORY_CSV_FILE, AID_HISTORY_FIELDNAMES):
-        if (entry.get("citizen_internal_id") == str(citizen_internal_id) and 
-            entry.get("next_date", "").strip() == ""):
-            return True
-    return False
+    if get_storage().indexed_lookups:
+        return any(entry.get("next_date", "").strip() == ""
+                   for entry in _select_rows("aid_history", "citizen_internal_id", citizen_internal_id))
+    return str(citizen_internal_id) in _aid_status()["received"]
+
+# Due-for-Aid Queries
+# The next aid date of a citizen is the next_date of their latest aid entry, as in
+# get_latest_next_dates(). The index keeps those dates as sorted (date, citizen ID)
+# pairs, so a date range is two bisections.
+def _build_due_index(rows):
+    latest = {}
+    for row in rows:
+        latest[row.get("citizen_internal_id", "")] = _parse_aid_date(row.get("next_date", ""))
+    next_dates = {citizen_id: due for citizen_id, due in latest.items() if due is not None}
+    return {"next_date": next_dates, "order": sorted((due, citizen_id) for citizen_id, due in next_dates.items())}
+
+def _add_due_entry(index, row, position):
+    citizen_id = row.get("citizen_internal_id", "")
+    old_due = index["next_date"].pop(citizen_id, None)
+    if old_due is not None:
+        order = index["order"]
+        i = bisect.bisect_left(order, (old_due, citizen_id))
+        if i < len(order) and order[i] == (old_due, citizen_id):
+            del order[i]
+    due = _parse_aid_date(row.get("next_date", ""))
+    if due is not None:
+        index["next_date"][citizen_id] = due
+        bisect.insort(index["order"], (due, citizen_id))
+
+_table_indexes["aid_history.due"] = (_build_due_index, _add_due_entry, None)
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return _parse_aid_date(str(value))
+
+def _due_positions(start, end, region=None):
+    """Returns {citizen row position: next aid date} for the citizens due between start
+       and end, or None if a date cannot be parsed.
+    """
+    start_date, end_date = _as_date(start), _as_date(end)
+    if start_date is None or end_date is None:
+        print(f"Error: Invalid date range {start!r} - {end!r}.")
+        return None
+    order = _cached_index("aid_history", "aid_history.due")["order"]
+    first = bisect.bisect_left(order, (start_date,))
+    last = bisect.bisect_left(order, (end_date + datetime.timedelta(days=1),))
+    id_index = _cached_index("citizens", "citizens.id")
+    in_region = None
+    if region is not None:
+        in_region = _cached_index("citizens", "citizens.region").get(str(region).strip().lower(), set())
+    due = {}
+    for next_date, citizen_id in order[first:last]:
+        position = id_index.get(citizen_id)
+        if position is not None and (in_region is None or position in in_region):
+            due[position] = next_date
+    return due
+
+# Ranking a row directly (parse its score, sort) costs about this many steps of a
+# walk over an already built priority index.
+DIRECT_RANK_COST = 10
+
+def _ranked_due_positions(due, include_inactive, limit=None):
+    """Returns the due row positions, highest priority score first, ranking from the
+       cheaper side: the due rows are sorted directly unless the priority index is
+       already built and small enough next to them that walking it costs less.
+    """
+    need = len(due) if limit is None else limit
+    order_name = "citizens.order.priority_score" if include_inactive else "citizens.active_by_priority"
+    _cached_rows("citizens")
+    index = _table_cache["citizens"]["indexes"].get(order_name)
+    if index is None or len(due) * DIRECT_RANK_COST < len(index):
+        return _rank_positions(due, need, include_inactive)
+    ranked = []
+    for key in index:
+        if len(ranked) >= need:
+            break
+        if key[-1] in due:
+            ranked.append(key[-1])
+    return ranked
+
+@_holds_cache_lock
+def due_citizen_ids(start, end, region=None, include_inactive=False):
+    """Returns the IDs of the citizens due_between() would return, in the same order."""
+    due = _due_positions(start, end, region)
+    if due is None:
+        return None
+    rows = _cached_rows("citizens")
+    return [int(rows[position].get("id", 0)) for position in _ranked_due_positions(due, include_inactive)]
+
+@_holds_cache_lock
+def due_between(start, end, region=None, include_inactive=False, limit=None):
+    """Returns the citizens whose next aid date falls between start and end (inclusive;
+       dates or date strings), highest priority_score first. region keeps one region
+       (as in Citizen Filters). Each record gets its "next_date" ("YYYY-MM-DD").
+       Returns None if a date cannot be parsed.
+    """
+    due = _due_positions(start, end, region)
+    if due is None:
+        return None
+    rows = _cached_rows("citizens")
+    citizens = []
+    for position in _ranked_due_positions(due, include_inactive, limit):
+        try:
+            citizen = citizen_record(rows[position])
+        except (ValueError, TypeError):
+            continue
+        citizen["next_date"] = due[position].isoformat()
+        citizens.append(citizen)
+    return citizens
+
+# Distribution Planning
+# plan_distribution() hands out the stock of each aid type to the highest-priority
+# active citizens. A household takes one stock unit per HOUSEHOLD_MEMBERS_PER_UNIT
+# members (at least one). Citizens who received the same type within the cooldown
+# are skipped; only delivered aid (entries without a next_date) counts, as in the
+# priority score. The plan is saved as pending aid entries: date and next_date are
+# the distribution day, so the recipients show up in due_between() for that day,
+# and citizens already scheduled for that type on that day are not planned again.
+AID_ENTRY_TYPES = ("food_distribution", "medicine_delivery", "cash_assistance", "child_supplies")
+DEFAULT_COOLDOWN_DAYS = 30
+HOUSEHOLD_MEMBERS_PER_UNIT = 5
+
+def _build_last_aid_index(rows):
+    """Builds {entry_type: {citizen ID: date of the latest delivered entry of that type}}."""
+    index = {}
+    for position, row in enumerate(rows):
+        _add_last_aid(index, row, position)
+    return index
+
+def _add_last_aid(index, row, position):
+    if row.get("next_date", "").strip():
+        return  # Scheduled, not delivered
+    aid_date = _parse_aid_date(row.get("date", ""), day_first=True)
+    if aid_date is None:
+        return
+    last_dates = index.setdefault(row.get("entry_type", "").strip(), {})
+    citizen_id = row.get("citizen_internal_id", "")
+    if citizen_id not in last_dates or aid_date > last_dates[citizen_id]:
+        last_dates[citizen_id] = aid_date
+
+_table_indexes["aid_history.last_by_type"] = (_build_last_aid_index, _add_last_aid, None)
+
+def _build_scheduled_index(rows):
+    """Builds {entry_type: {next aid date: {citizen IDs scheduled for it}}}."""
+    index = {}
+    for position, row in enumerate(rows):
+        _add_scheduled(index, row, position)
+    return index
+
+def _add_scheduled(index, row, position):
+    next_date = _parse_aid_date(row.get("next_date", ""))
+    if next_date is not None:
+        scheduled = index.setdefault(row.get("entry_type", "").strip(), {})
+        scheduled.setdefault(next_date, set()).add(row.get("citizen_internal_id", ""))
+
+_table_indexes["aid_history.scheduled_by_type"] = (_build_scheduled_index, _add_scheduled, None)
+
+def household_units(household_members, members_per_unit=HOUSEHOLD_MEMBERS_PER_UNIT):
+    """Returns the stock units one household takes: one per members_per_unit members, at least one."""
+    return max(1, -(-household_members // members_per_unit))
+
+def _plan_candidates(filter_criteria, members_per_unit):
+    """Returns [(-priority score, position, citizen ID, units)] for the active citizens
+       that meet filter_criteria, in table order.
+    """
+    rows = _cached_rows("citizens")
+    if filter_criteria:
+        id_index = _cached_index("citizens", "citizens.id")
+        positions = sorted(id_index[str(citizen_id)] for citizen_id in get_citizen_ids("table", filter_criteria))
+    else:
+        positions = range(len(rows))
+    candidates = []
+    for position in positions:
+        row = rows[position]
+        if not _is_active_row(row):
+            continue
+        try:
+            candidates.append((-float(row.get("priority_score", 0.0)), position, row.get("id", ""),
+                               household_units(int(row.get("household_members", 0)), members_per_unit)))
+        except (ValueError, TypeError):
+            continue
+    return candidates
+
+@_holds_cache_lock
+def plan_distribution(stock, distribution_date=None, cooldown_days=DEFAULT_COOLDOWN_DAYS,
+                      members_per_unit=HOUSEHOLD_MEMBERS_PER_UNIT, filter_criteria=None, dry_run=False):
+    """Plans a distribution day. stock is {entry_type: units available}; cooldown_days
+       is one number of days or {entry_type: days}; filter_criteria limits the citizens
+       (see Citizen Filters). Each type goes to the highest priority_score first, one
+       allocation per citizen, skipping households larger than the stock left. A type's
+       "in_cooldown" count includes citizens already scheduled for it that day. Unless
+       dry_run is set, the whole plan is written with one append.
+       Returns {"date", "allocations", "by_type", "candidates", "dry_run"}, or None on failure.
+    """
+    day = _as_date(distribution_date) if distribution_date is not None else datetime.date.today()
+    if day is None:
+        print(f"Error: Invalid distribution date {distribution_date!r}.")
+        return None
+    try:
+        stock = {str(entry_type).strip(): int(units) for entry_type, units in stock.items()}
+    except (ValueError, TypeError):
+        print(f"Error: Stock must map aid types to whole numbers of units, got {stock!r}.")
+        return None
+    if any(units < 0 for units in stock.values()) or "" in stock:
+        print("Error: Stock units cannot be negative and every aid type needs a name.")
+        return None
+
+    with locked_table("aid_history"):
+        _cached_rows("aid_history")  # Warm the cache so the append keeps its indexes current
+        last_aid = _cached_index("aid_history", "aid_history.last_by_type")
+        scheduled = _cached_index("aid_history", "aid_history.scheduled_by_type")
+        candidates = _plan_candidates(filter_criteria, members_per_unit)
+        rows = _cached_rows("citizens")
+
+        allocations = []
+        by_type = {}
+        for entry_type, units in stock.items():
+            cooldown = cooldown_days.get(entry_type, DEFAULT_COOLDOWN_DAYS) if isinstance(cooldown_days, dict) else cooldown_days
+            last_dates = last_aid.get(entry_type, {})
+            already_planned = scheduled.get(entry_type, {}).get(day, set())
+            heap = []
+            in_cooldown = 0
+            for candidate in candidates:
+                last_date = last_dates.get(candidate[2])
+                if candidate[2] in already_planned or (last_date is not None and (day - last_date).days < cooldown):
+                    in_cooldown += 1
+                else:
+                    heap.append(candidate)
+            heapq.heapify(heap)
+
+            remaining = units
+            recipients = did_not_fit = 0
+            while heap and remaining > 0:
+                _, position, _, needed = heapq.heappop(heap)
+                if needed > remaining:
+                    did_not_fit += 1
+                    continue
+                remaining -= needed
+                recipients += 1
+                citizen = citizen_record(rows[position])
+                allocations.append({
+                    "citizen_id": citizen["id"],
+                    "national_id": citizen.get("national_id", ""),
+                    "full_name": citizen.get("full_name", ""),
+                    "phone_number": citizen.get("phone_number", ""),
+                    "address": citizen.get("address", ""),
+                    "household_members": citizen["household_members"],
+                    "priority_score": citizen["priority_score"],
+                    "entry_type": entry_type,
+                    "units": needed,
+                })
+            by_type[entry_type] = {"stock": units, "allocated": units - remaining, "remaining": remaining,
+                                   "recipients": recipients, "in_cooldown": in_cooldown,
+                                   "did_not_fit": did_not_fit, "waiting": len(heap)}
+
+        plan = {"date": day.isoformat(), "allocations": allocations, "by_type": by_type,
+                "candidates": len(candidates), "dry_run": dry_run}
+        if dry_run or not allocations:
+            return plan
+
+        first_id = reserve_ids("aid_history", len(allocations))
+        if first_id is None:
+            print("Critical Error: Could not generate aid history IDs.")
+            return None
+        timestamp = datetime.datetime.now().isoformat()
+        entries = [{"id": str(first_id + offset), "citizen_internal_id": str(allocation["citizen_id"]),
+                    "entry_type": allocation["entry_type"], "date": plan["date"], "next_date": plan["date"],
+                    "timestamp": timestamp}
+                   for offset, allocation in enumerate(allocations)]
+        if not _append_rows("aid_history", entries):
+            print("Error: Failed to save the distribution plan.")
+            return None
+    print(f"Saved a distribution plan for {plan['date']}: {len(allocations)} pending aid entries.")
+    return plan
 
 # Messages Operations
 def save_message_entry(citizen_internal_id, message):
-    """Saves a message entry to the CSV file."""
+    """Saves a message entry to the messages table."""
     new_id = get_next_id_for_table(MESSAGES_CSV_FILE, MESSAGES_FIELDNAMES)
     
     entry = {
@@ -485,15 +2391,80 @@ def save_message_entry(citizen_internal_id, message):
         "timestamp": datetime.datetime.now().isoformat()
     }
     
-    return append_csv_dict(MESSAGES_CSV_FILE, entry, MESSAGES_FIELDNAMES)
+    return _append_rows("messages", [entry])
 
 def read_messages(citizen_internal_id=None):
-    """Reads message entries, optionally filtered by citizen ID."""
-    messages = []
-    for entry in read_csv_dict(MESSAGES_CSV_FILE, MESSAGES_FIELDNAMES):
-        if citizen_internal_id is None or entry.get("citizen_internal_id") == str(citizen_internal_id):
-            messages.append(entry)
-    return messages
+    """Reads message entries, optionally filtered by citizen ID (see read_aid_history)."""
+    if citizen_internal_id is not None:
+        return get_storage().find_rows("messages", "citizen_internal_id", citizen_internal_id)
+    return [dict(entry) for entry in _load_rows("messages")]
+
+# Statistics Operations
+# Per-table partial statistics are cached against each table's signature, so a
+# refresh only rescans the tables that changed since the last call.
+_stats_cache = {}
+
+def _scan_rows(table):
+    """Returns the cached rows if the table cache is current, otherwise streams the table."""
+    entry = _current_entry(table, _table_signature(table))
+    if entry is not None:
+        return entry["rows"]
+    return _load_rows(table)
+
+@_holds_cache_lock
+def _table_stats(table, accumulate, initial):
+    """Computes (or reuses) the partial statistics of one table in a single pass."""
+    signature = _table_signature(table)
+    cached = _stats_cache.get(table)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    partial = initial()
+    for row in _scan_rows(table):
+        accumulate(partial, row)
+    _stats_cache[table] = (signature, partial)
+    return partial
+
+def _accumulate_citizen_stats(partial, row):
+    partial["ids"].add(row.get("id", ""))
+    if row.get("is_active", "True").strip().lower() == "true":
+        partial["active"] += 1
+    else:
+        partial["inactive"] += 1
+
+def _accumulate_aid_stats(partial, row):
+    partial["operations"] += 1
+    entry_type = row.get("entry_type", "")
+    partial["by_type"][entry_type] = partial["by_type"].get(entry_type, 0) + 1
+    if row.get("next_date", "").strip() == "":
+        partial["received"].add(row.get("citizen_internal_id", ""))
+
+def _accumulate_message_stats(partial, row):
+    partial["messages"] += 1
+
+def get_system_stats():
+    """Returns dashboard statistics computed in one pass per data file:
+       total/active/inactive citizens, received/not received aid, aid operations
+       (total and by entry_type) and the number of messages.
+    """
+    citizens = _table_stats("citizens", _accumulate_citizen_stats,
+                            lambda: {"ids": set(), "active": 0, "inactive": 0})
+    aid = _table_stats("aid_history", _accumulate_aid_stats,
+                       lambda: {"operations": 0, "by_type": {}, "received": set()})
+    messages = _table_stats("messages", _accumulate_message_stats,
+                            lambda: {"messages": 0})
+
+    total_citizens = citizens["active"] + citizens["inactive"]
+    received_count = len(citizens["ids"] & aid["received"])
+    return {
+        "total_citizens": total_citizens,
+        "active_citizens": citizens["active"],
+        "inactive_citizens": citizens["inactive"],
+        "received_aid": received_count,
+        "not_received": total_citizens - received_count,
+        "aid_operations": aid["operations"],
+        "aid_operations_by_type": dict(aid["by_type"]),
+        "messages": messages["messages"],
+    }
 
 # Initialize system on import
 if __name__ == "__main__":
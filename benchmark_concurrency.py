@@ -0,0 +1,96 @@
+# benchmark_concurrency.py - Multi-process stress test for several app instances sharing the CSV files
+
+import contextlib
+import io
+import multiprocessing
+import sys
+import tempfile
+import time
+
+import backend_functions as be
+
+OPERATIONS_PER_CITIZEN = 4  # register, update, message, aid entry
+
+def _writer(data_dir, worker, citizens):
+    """One app instance: registers citizens and updates, messages and serves each of them."""
+    be.configure_storage("csv", data_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(citizens):
+            record = be.register_citizen_csv({
+                "national_id": str(600000000 + worker * 100000 + i),
+                "full_name": f"Worker {worker} Citizen {i}",
+                "secret_code": "1234"
+            })
+            if record is None:
+                continue
+            be.update_citizen_details_csv(record["id"], {"priority_score": f"{worker}.{i}"})
+            be.save_message_entry(record["id"], f"Message from worker {worker}")
+            be.save_aid_history_entry(record["id"], "food_distribution", "2025-01-01", "")
+
+def _reader(data_dir, stop):
+    """Keeps scanning the tables while the writers run."""
+    be.configure_storage("csv", data_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        while not stop.is_set():
+            be.get_system_stats()
+            be.get_citizens_list_csv()
+
+def _check_results(writers, citizens):
+    """Returns a list of problems found in the shared data (empty when nothing was lost)."""
+    storage = be.get_storage()
+    problems = []
+    expected = writers * citizens
+    for table in ("citizens", "messages", "aid_history"):
+        rows = list(storage.read_rows(table))
+        ids = [row["id"] for row in rows]
+        if len(rows) != expected:
+            problems.append(f"{table}: {len(rows)} rows, expected {expected}")
+        if len(set(ids)) != len(ids):
+            problems.append(f"{table}: {len(ids) - len(set(ids))} duplicate IDs")
+
+    for row in storage.read_rows("citizens"):
+        worker, i = row["full_name"].split()[1], row["full_name"].split()[3]
+        if row["priority_score"] != f"{worker}.{i}":
+            problems.append(f"citizen {row['id']}: lost update (priority_score {row['priority_score']!r})")
+    return problems
+
+def run_stress(writers, citizens, readers=1):
+    """Runs writer (and reader) processes against one fresh data directory and checks for lost writes."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        be.configure_storage("csv", data_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            be.setup_csv_files()
+
+        stop = multiprocessing.Event()
+        reader_processes = [multiprocessing.Process(target=_reader, args=(data_dir, stop)) for _ in range(readers)]
+        writer_processes = [multiprocessing.Process(target=_writer, args=(data_dir, worker, citizens))
+                            for worker in range(writers)]
+        for process in reader_processes:
+            process.start()
+        start = time.perf_counter()
+        for process in writer_processes:
+            process.start()
+        for process in writer_processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for process in reader_processes:
+            process.join()
+
+        be.configure_storage("csv", data_dir)
+        problems = _check_results(writers, citizens)
+
+    operations = writers * citizens * OPERATIONS_PER_CITIZEN
+    status = "OK" if not problems else f"{len(problems)} PROBLEMS"
+    print(f"  {writers:>2} writers {operations:>7} writes {elapsed:8.2f} s {operations / elapsed:10.1f} writes/s  {status}")
+    for problem in problems[:10]:
+        print(f"     ✗ {problem}")
+    return not problems
+
+if __name__ == "__main__":
+    citizens = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    writer_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8]
+    print(f"CSV store, {citizens} citizens per writer, 1 concurrent reader")
+    results = [run_stress(writers, citizens) for writers in writer_counts]
+    print("\n✓ No lost or duplicated writes" if all(results) else "\n✗ Lost or duplicated writes detected")
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,60 @@
+# benchmark_storage.py - Times the common backend operations on each storage engine
+
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+import backend_functions as be
+
+def _time(label, func, repeat=1):
+    # Keep the backend's per-operation prints out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<32} {elapsed * 1000:10.2f} ms")
+    return elapsed
+
+def benchmark_engine(engine, citizen_count):
+    """Runs the benchmark against a fresh, empty data directory for one engine."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        be.configure_storage(engine, data_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            be.setup_csv_files()
+        print(f"\n{engine} engine ({citizen_count} citizens)")
+
+        rows = []
+        for i in range(1, citizen_count + 1):
+            rows.append({
+                "id": str(i), "national_id": str(400000000 + i), "full_name": f"Citizen {i}",
+                "phone_number": "0590000000", "address": "Gaza", "household_members": str(i % 10),
+                "dependents": str(i % 5), "priority_score": str(i % 8), "is_active": "True",
+                "registration_date": "2025-01-01", "secret_code_hash": be._hash_password("1234")
+            })
+        _time("bulk load", lambda: be.get_storage().overwrite_rows("citizens", rows))
+        be.invalidate_table_cache()
+
+        middle = str(400000000 + citizen_count // 2)
+        _time("first lookup (cold)", lambda: be.check_citizen_exists_csv(middle))
+        _time("lookup (warm)", lambda: be.check_citizen_exists_csv(middle), repeat=100)
+        _time("citizen login", lambda: be.verify_citizen_login_csv(middle, "1234"), repeat=100)
+        _time("details by ID", lambda: be.get_citizen_details_csv(citizen_count // 2), repeat=100)
+        _time("register citizen", lambda: be.register_citizen_csv(
+            {"national_id": "399999999", "full_name": "New Citizen", "secret_code": "1234"}))
+        _time("update priority score", lambda: be.update_citizen_details_csv(citizen_count // 2, {"priority_score": 9.0}),
+              repeat=5)
+        _time("list sorted by priority", lambda: be.get_citizens_list_csv(sort_by="priority_score"))
+        _time("save aid entry", lambda: be.save_aid_history_entry(1, "food_distribution", "2025-01-01", ""), repeat=20)
+        _time("system stats", be.get_system_stats)
+
+        storage = be.get_storage()
+        if hasattr(storage, "close"):
+            storage.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for engine in sys.argv[2:] or sorted(be.STORAGE_ENGINES):
+        benchmark_engine(engine, count)
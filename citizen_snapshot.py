@@ -0,0 +1,220 @@
+# citizen_snapshot.py - Columnar NumPy snapshot of the citizen registry for vectorized analytics
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import backend_functions as be
+
+# One .npy file per column (plus regions.npy and meta.json) in this folder next to
+# the data files. Plain .npy files can be memory-mapped, so startup does not have to
+# parse the citizen table again while the data version is unchanged.
+SNAPSHOT_DIR_NAME = "citizens_snapshot"
+# Bumped when the way columns are built changes, so older saved snapshots are rebuilt.
+SNAPSHOT_FORMAT = 2
+COLUMN_TYPES = {
+    "id": np.int64,
+    "priority_score": np.float64,
+    "household_members": np.int32,
+    "dependents": np.int32,
+    "is_active": np.bool_,
+    "region_code": np.int16,
+    "registration_date": "datetime64[D]",
+}
+
+_snapshot = None
+
+def snapshot_dir():
+    return os.path.join(be.DATA_DIR, SNAPSHOT_DIR_NAME)
+
+def _data_version():
+    """The citizens table version as a JSON string, tagged with the snapshot format,
+       engine and folder.
+    """
+    storage = be.get_storage()
+    return json.dumps([SNAPSHOT_FORMAT, storage.name, os.path.abspath(be.DATA_DIR),
+                       storage.version("citizens")])
+
+def _day(value):
+    """Converts a registration date (anything be.parse_date_text() reads) to a NumPy day, NaT if unreadable."""
+    parsed = be.parse_date_text(value, False)
+    return np.datetime64(parsed.date(), "D") if parsed else np.datetime64("NaT", "D")
+
+def build_snapshot(rows):
+    """Converts citizen rows (as stored) to a snapshot: {"columns": {name: array}, "regions": array}.
+       Rows whose numeric fields cannot be parsed are left out, like get_citizens_list_csv().
+    """
+    regions = {"": 0}  # lower-case name -> code
+    region_names = [""]
+    values = {column: [] for column in COLUMN_TYPES}
+    for row in rows:
+        try:
+            citizen = be.citizen_record(row)
+        except (ValueError, TypeError):
+            continue
+        region = be.citizen_region(citizen.get("address", ""))
+        if region.lower() not in regions:
+            regions[region.lower()] = len(region_names)
+            region_names.append(region)
+        values["id"].append(citizen["id"])
+        values["priority_score"].append(citizen["priority_score"])
+        values["household_members"].append(citizen["household_members"])
+        values["dependents"].append(citizen["dependents"])
+        values["is_active"].append(citizen["is_active"])
+        values["region_code"].append(regions[region.lower()])
+        values["registration_date"].append(_day(citizen.get("registration_date", "")))
+
+    columns = {column: np.array(values[column], dtype=dtype) for column, dtype in COLUMN_TYPES.items()}
+    return {"columns": columns, "regions": np.array(region_names, dtype=str)}
+
+def save_snapshot(snapshot, version, directory=None):
+    """Writes the snapshot files into a temporary folder and swaps it in, so readers
+       never see a half-written snapshot.
+    """
+    directory = directory or snapshot_dir()
+    parent = os.path.dirname(os.path.abspath(directory))
+    temp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{SNAPSHOT_DIR_NAME}.")
+    try:
+        for column, array in snapshot["columns"].items():
+            np.save(os.path.join(temp_dir, f"{column}.npy"), array)
+        np.save(os.path.join(temp_dir, "regions.npy"), snapshot["regions"])
+        with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "rows": len(snapshot["columns"]["id"])}, f)
+
+        old_dir = None
+        if os.path.isdir(directory):
+            old_dir = f"{temp_dir}.old"
+            os.rename(directory, old_dir)
+        os.rename(temp_dir, directory)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not save the citizen snapshot: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return False
+
+def load_snapshot(version=None, directory=None, mmap=True):
+    """Memory-maps a saved snapshot. Returns None when it is missing, unreadable or,
+       if a version is given, built from a different version of the data.
+    """
+    directory = directory or snapshot_dir()
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if version is not None and meta.get("version") != version:
+            return None
+        mode = "r" if mmap else None
+        columns = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode=mode)
+                   for column in COLUMN_TYPES}
+        regions = np.load(os.path.join(directory, "regions.npy"))
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Warning: Ignoring unreadable citizen snapshot: {e}")
+        return None
+    return {"columns": columns, "regions": regions, "version": meta.get("version")}
+
+def get_snapshot():
+    """Returns the snapshot for the current citizen data: the one in memory, the saved
+       one if it is still current, or a fresh one (saved for the next start).
+    """
+    global _snapshot
+    version = _data_version()
+    if _snapshot is not None and _snapshot["version"] == version:
+        return _snapshot
+
+    persistent = be.get_storage().name != "memory"
+    snapshot = load_snapshot(version) if persistent else None
+    if snapshot is None:
+        rows = be.read_citizens()
+        snapshot = build_snapshot(rows)
+        # Only keep it if no write landed while the rows were read
+        if _data_version() != version:
+            return dict(snapshot, version=None)
+        snapshot["version"] = version
+        if persistent:
+            save_snapshot(snapshot, version)
+    _snapshot = snapshot
+    return snapshot
+
+def _column_for(snapshot, field):
+    columns = snapshot["columns"]
+    if field == "region":
+        return columns["region_code"]
+    if field not in columns:
+        raise ValueError(f"Unknown snapshot field {field!r}. Choose from: region, {', '.join(columns)}")
+    return columns[field]
+
+def _filter_value(snapshot, field, value):
+    """Converts a filter value to the column's type (region names to region codes)."""
+    if field == "region":
+        codes = np.flatnonzero(np.char.lower(snapshot["regions"]) == str(value).strip().lower())
+        return int(codes[0]) if len(codes) else -1
+    if field == "registration_date":
+        return _day(value) if isinstance(value, str) else np.datetime64(value, "D")
+    return value
+
+def filter_mask(snapshot, filter_criteria=None):
+    """Returns a boolean array selecting the citizens that meet filter_criteria, using
+       the same forms as the backend: value, [values] or {"min": a, "max": b}.
+       Fields are the snapshot columns plus "region".
+    """
+    mask = np.ones(len(snapshot["columns"]["id"]), dtype=bool)
+    for field, condition in (filter_criteria or {}).items():
+        column = _column_for(snapshot, field)
+        if isinstance(condition, dict):
+            if condition.get("min") is not None:
+                mask &= column >= _filter_value(snapshot, field, condition["min"])
+            if condition.get("max") is not None:
+                mask &= column <= _filter_value(snapshot, field, condition["max"])
+        elif isinstance(condition, (list, tuple, set)):
+            mask &= np.isin(column, [_filter_value(snapshot, field, value) for value in condition])
+        else:
+            mask &= column == _filter_value(snapshot, field, condition)
+    return mask
+
+def count_citizens(filter_criteria=None):
+    """Returns how many citizens meet filter_criteria."""
+    return int(np.count_nonzero(filter_mask(get_snapshot(), filter_criteria)))
+
+def citizen_ids(filter_criteria=None):
+    """Returns the IDs of the citizens that meet filter_criteria, in table order."""
+    snapshot = get_snapshot()
+    return snapshot["columns"]["id"][filter_mask(snapshot, filter_criteria)].tolist()
+
+def score_histogram(bins=10, filter_criteria=None):
+    """Returns (counts, bin_edges) of priority scores, as numpy.histogram does."""
+    snapshot = get_snapshot()
+    scores = snapshot["columns"]["priority_score"][filter_mask(snapshot, filter_criteria)]
+    return np.histogram(scores, bins=bins)
+
+def household_size_counts(filter_criteria=None):
+    """Returns {household size: number of citizens}."""
+    snapshot = get_snapshot()
+    sizes = snapshot["columns"]["household_members"][filter_mask(snapshot, filter_criteria)]
+    counts = np.bincount(np.clip(sizes, 0, None))
+    return {size: int(count) for size, count in enumerate(counts) if count}
+
+def region_counts(filter_criteria=None):
+    """Returns {region: number of citizens}; citizens without a region are counted under ""."""
+    snapshot = get_snapshot()
+    codes = snapshot["columns"]["region_code"][filter_mask(snapshot, filter_criteria)]
+    counts = np.bincount(codes, minlength=len(snapshot["regions"]))
+    return {str(region): int(count) for region, count in zip(snapshot["regions"], counts) if count}
+
+def registrations_by_month(filter_criteria=None):
+    """Returns {"YYYY-MM": number of registrations}, oldest month first."""
+    snapshot = get_snapshot()
+    dates = snapshot["columns"]["registration_date"][filter_mask(snapshot, filter_criteria)]
+    months, counts = np.unique(dates[~np.isnat(dates)].astype("datetime64[M]"), return_counts=True)
+    return {str(month): int(count) for month, count in zip(months, counts)}
+
+if __name__ == "__main__":
+    snapshot = get_snapshot()
+    print(f"✓ Snapshot of {len(snapshot['columns']['id'])} citizens in {snapshot_dir()}")
+    print(f"Active citizens: {count_citizens({'is_active': True})}")
+    for region, count in sorted(region_counts().items(), key=lambda item: -item[1]):
+        print(f"  {region or '(no region)':<20} {count}")
@@ -42,23 +42,21 @@ def create_initial_data():
         print(f"✗ Error reading citizens_data.csv: {e}")
         return
 
-    citizen_ids = []
     for citizen_data in citizens_data:
         # Ensure optional fields exist
         citizen_data.setdefault("is_active", "True")
         citizen_data.setdefault("registration_date", datetime.datetime.now().strftime("%Y-%m-%d"))
         citizen_data.setdefault("latitude", "")
         citizen_data.setdefault("longitude", "")
-        
-        registered_record = be.register_citizen_csv(citizen_data)
-        if registered_record:
-            citizen_id = registered_record.get("id")
-            citizen_ids.append(citizen_id)
-            print(f"✓ Created citizen: {citizen_data.get('full_name', 'N/A')} (ID: {citizen_id})")
-        else:
-            print(f"✗ Failed to create citizen: {citizen_data.get('full_name', 'N/A')}")
 
-    print(f"\nCitizen Accounts Created: {len(citizen_ids)}")
+    registered_records, rejected = be.register_citizens_bulk(citizens_data)
+    for record in registered_records:
+        print(f"✓ Created citizen: {record.get('full_name', 'N/A')} (ID: {record.get('id')})")
+    for rejection in rejected:
+        row = citizens_data[rejection["row"]] if rejection["row"] is not None else {}
+        print(f"✗ Failed to create citizen: {row.get('full_name', 'N/A')} ({rejection['reason']})")
+
+    print(f"\nCitizen Accounts Created: {len(registered_records)}")
     
     print("\nSkipping aid history and messages setup (optional)\n")
     print("="*60)
@@ -0,0 +1,118 @@
+# excel_export.py - Streaming export of the citizen registry to Excel
+
+import os
+import sys
+import tempfile
+
+import openpyxl
+
+import backend_functions as be
+
+EXCEL_MAX_ROWS = 1048576  # Rows per worksheet in .xlsx, including the header
+SHEET_TITLE = "Citizens Data"
+PROGRESS_EVERY = 500
+
+CITIZEN_EXPORT_HEADERS = ["ID", "National ID", "Full Name", "Phone Number", "Priority Score", "Received Aid"]
+
+def citizen_export_rows(sort_by="id", filter_criteria=None, include_inactive=False):
+    """Yields one spreadsheet row per citizen. Aid status comes from one set of
+       citizen IDs with received aid, fetched before the first row.
+    """
+    received_ids = be.get_received_aid_ids()
+    for citizen in be.iter_citizens(sort_by, filter_criteria, include_inactive):
+        yield [
+            citizen.get("id", ""),
+            citizen.get("national_id", ""),
+            citizen.get("full_name", ""),
+            citizen.get("phone_number", ""),
+            f"{citizen.get('priority_score', 0.0):.1f}",
+            "Yes" if str(citizen.get("id")) in received_ids else "No"
+        ]
+
+def write_rows_to_excel(file_path, headers, rows, total=None, sheet_title=SHEET_TITLE,
+                        max_rows_per_sheet=EXCEL_MAX_ROWS, progress=None):
+    """Streams rows into a write-only workbook, starting a new worksheet ("Title (2)", ...)
+       whenever one is full, and replaces file_path only once the workbook is complete.
+       progress(done, total) is called every PROGRESS_EVERY rows and may raise to abort.
+       Returns (rows written, worksheets).
+    """
+    rows_per_sheet = max_rows_per_sheet - 1  # Each sheet repeats the header
+    if rows_per_sheet < 1:
+        raise ValueError("max_rows_per_sheet must leave room for at least one data row.")
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheets = 0
+    sheet_rows = rows_per_sheet
+    written = 0
+    for row in rows:
+        if sheet_rows >= rows_per_sheet:
+            sheets += 1
+            worksheet = workbook.create_sheet(sheet_title if sheets == 1 else f"{sheet_title} ({sheets})")
+            worksheet.append(headers)
+            sheet_rows = 0
+        worksheet.append(row)
+        sheet_rows += 1
+        written += 1
+        if progress is not None and written % PROGRESS_EVERY == 0:
+            progress(written, total if total is not None else written)
+    if sheets == 0:
+        workbook.create_sheet(sheet_title).append(headers)
+        sheets = 1
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".export.", suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress is not None:
+        progress(written, written)
+    return written, sheets
+
+def export_citizens_to_excel(file_path, sort_by="id", filter_criteria=None, include_inactive=False,
+                             max_rows_per_sheet=EXCEL_MAX_ROWS, progress=None):
+    """Exports the citizens get_citizens_list_csv() would list to an .xlsx file, one row
+       at a time, so memory use does not grow with the registry. Returns (rows, worksheets).
+    """
+    total = len(be.get_citizen_ids(sort_by, filter_criteria, include_inactive))
+    return write_rows_to_excel(file_path, CITIZEN_EXPORT_HEADERS,
+                               citizen_export_rows(sort_by, filter_criteria, include_inactive),
+                               total=total, max_rows_per_sheet=max_rows_per_sheet, progress=progress)
+
+DISTRIBUTION_PLAN_HEADERS = ["Aid Type", "Citizen ID", "National ID", "Full Name", "Phone Number",
+                             "Address", "Household Members", "Units", "Priority Score"]
+
+def distribution_plan_rows(plan):
+    """Yields one spreadsheet row per allocation of a be.plan_distribution() plan."""
+    for allocation in plan["allocations"]:
+        yield [
+            allocation["entry_type"],
+            allocation["citizen_id"],
+            allocation["national_id"],
+            allocation["full_name"],
+            allocation["phone_number"],
+            allocation["address"],
+            allocation["household_members"],
+            allocation["units"],
+            f"{allocation['priority_score']:.1f}"
+        ]
+
+def export_distribution_plan_to_excel(file_path, plan, max_rows_per_sheet=EXCEL_MAX_ROWS, progress=None):
+    """Exports a distribution plan to an .xlsx file, one row per recipient and aid type.
+       Returns (rows, worksheets).
+    """
+    return write_rows_to_excel(file_path, DISTRIBUTION_PLAN_HEADERS, distribution_plan_rows(plan),
+                               total=len(plan["allocations"]), sheet_title=f"Distribution {plan['date']}",
+                               max_rows_per_sheet=max_rows_per_sheet, progress=progress)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python excel_export.py OUTPUT.xlsx [rows_per_sheet]")
+        sys.exit(1)
+    max_rows = int(sys.argv[2]) + 1 if len(sys.argv) > 2 else EXCEL_MAX_ROWS
+    exported, sheet_count = export_citizens_to_excel(sys.argv[1], max_rows_per_sheet=max_rows)
+    print(f"✓ Exported {exported} citizens to {sys.argv[1]} ({sheet_count} worksheet(s))")
@@ -1,15 +1,116 @@
-import pandas as pd
-import hashlib
+# hash_secret_codes.py - Hashes or re-hashes the stored secret codes and passwords on every CPU core
+#
+#   python hash_secret_codes.py                     wrap legacy SHA-256 citizen hashes in PBKDF2
+#   python hash_secret_codes.py --mode plain        hash plain secret codes (freshly imported data)
+#   python hash_secret_codes.py --table admins      same for admin passwords
+#
+# The CSV file is read and written in chunks while a process pool hashes the
+# chunks, so memory stays bounded; the new file replaces the old one atomically.
 
-def hash_secret(secret_code):
-    salt = "citizen_aid_system_2024"
-    return hashlib.sha256((secret_code + salt).encode('utf-8')).hexdigest()
+import argparse
+import collections
+import concurrent.futures
+import csv
+import os
+import sys
+import tempfile
 
-df = pd.read_csv("citizens_data.csv", encoding="utf-8")
+import backend_functions as be
 
-if "secret_code_hash" in df.columns:
-    df["secret_code_hash"] = df["secret_code_hash"].apply(hash_secret)
-    df.to_csv("citizens_data.csv", index=False, encoding="utf-8")
-    print("✓ Hashing complete! File updated.")
-else:
-    print("✗ Column 'secret_code_hash' not found in the file.")
+HASH_COLUMNS = {"citizens": "secret_code_hash", "admins": "password_hash"}
+CHUNK_SIZE = 1000
+
+def _is_hashed(value):
+    return be.is_legacy_hash(value) or value.split("$", 1)[0] in (be.PBKDF2_PREFIX, be.LEGACY_PBKDF2_PREFIX)
+
+def rehash_values(values, mode, kdf=None, iterations=None):
+    """Returns the new stored hashes for one chunk (runs in a worker process).
+       "upgrade" wraps legacy hashes in PBKDF2; "plain" hashes values that are not hashed yet.
+    """
+    if mode == "upgrade":
+        return [be.upgrade_legacy_hash(value, iterations) for value in values]
+    return [value if _is_hashed(value) else be.hash_secret(value, kdf, iterations) for value in values]
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def rehash_table(table="citizens", mode="upgrade", kdf=None, iterations=None, workers=None, chunk_size=CHUNK_SIZE):
+    """Rewrites the hash column of a CSV table through a process pool. Holds the table
+       lock for the whole run so no app instance writes in between. Returns True on success.
+    """
+    storage = be.get_storage()
+    if not isinstance(storage, be.CsvStorage):
+        print(f"✗ The {storage.name} engine is not supported; this tool rewrites the CSV data files.")
+        return False
+    column = HASH_COLUMNS[table]
+    fieldnames = be.TABLE_FIELDNAMES[table]
+    workers = workers or os.cpu_count() or 1
+    file_path = storage.files[table]
+
+    with be.locked_table(table):
+        # Fold pending logged updates into the CSV file before rewriting it
+        if not storage.compact(table):
+            print(f"✗ Could not fold the pending changes into {file_path}.")
+            return False
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".",
+                                              prefix=os.path.basename(file_path) + ".tmp")
+        rows_done = changed = 0
+        try:
+            with open(file_path, newline="", encoding="utf-8-sig") as source, \
+                 os.fdopen(temp_fd, "w", newline="", encoding="utf-8") as target, \
+                 concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                writer = csv.DictWriter(target, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, extrasaction='ignore')
+                writer.writeheader()
+
+                def write_chunk(chunk, future):
+                    nonlocal rows_done, changed
+                    for row, new_hash in zip(chunk, future.result()):
+                        changed += row.get(column, "") != new_hash
+                        row[column] = new_hash
+                        writer.writerow({field: row.get(field, "") for field in fieldnames})
+                    rows_done += len(chunk)
+                    print(f"  {rows_done} rows hashed", end="\r")
+
+                # Keep a few chunks per worker in flight; older ones are written in order
+                pending = collections.deque()
+                for chunk in _chunks(csv.DictReader(source), chunk_size):
+                    values = [row.get(column, "") for row in chunk]
+                    pending.append((chunk, pool.submit(rehash_values, values, mode, kdf, iterations)))
+                    if len(pending) >= 2 * workers:
+                        write_chunk(*pending.popleft())
+                while pending:
+                    write_chunk(*pending.popleft())
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, file_path)
+        except Exception as e:
+            print(f"\n✗ Re-hashing {file_path} failed: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        be.invalidate_table_cache(table)
+
+    print(f"\n✓ Hashing complete! {changed} of {rows_done} {table} hashes updated in {file_path}.")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash or re-hash stored secret codes and passwords.")
+    parser.add_argument("--table", choices=sorted(HASH_COLUMNS), default="citizens")
+    parser.add_argument("--mode", choices=["upgrade", "plain"], default="upgrade",
+                        help="upgrade: wrap legacy SHA-256 hashes in PBKDF2; plain: hash plain-text values")
+    parser.add_argument("--kdf", choices=["sha256", be.PBKDF2_PREFIX], default=None,
+                        help="KDF for --mode plain (default: CITIZEN_AID_PASSWORD_KDF)")
+    parser.add_argument("--iterations", type=int, default=None, help="PBKDF2 iterations")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    success = rehash_table(args.table, args.mode, args.kdf, args.iterations, args.workers, args.chunk_size)
+    sys.exit(0 if success else 1)
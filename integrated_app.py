@@ -1,10 +1,15 @@
 # integrated_app.py - Complete and Improved Version
 
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import datetime
+import sys
+import queue
+import threading
+import concurrent.futures
 import backend_functions as be
-import openpyxl
+import excel_export
 from tkinter import filedialog
 
 # Global variable to store the internal ID of the currently logged-in citizen
@@ -21,6 +26,254 @@ def calculate_score(q1_var, q2_var, q3_var, q4_var):
     score += 1 if q4_var.get() == "Yes" else 0
     return float(score)
 
+class VirtualTreeview:
+    """A Treeview for long lists that only holds the rows currently on screen.
+       set_rows() takes the ordered row keys (e.g. citizen IDs); load_values(keys)
+       is called on the background worker for the visible window plus a buffer and
+       returns one tuple of column values per key. Rows show as "Loading..." until
+       their values arrive, or "N/A" if it returns fewer rows than keys. Fetched
+       rows are kept until the next set_rows().
+    """
+
+    BUFFER_ROWS = 50
+
+    def __init__(self, parent, columns, load_values, empty_text="No rows found.", message_column=2):
+        self.load_values = load_values
+        self.empty_text = empty_text
+        self.message_column = message_column
+        self.message = None
+        self.keys = []
+        self.top = 0
+        self.visible = 1
+        self.values_cache = {}
+        self.fetching = False
+        self.generation = 0  # Bumped by set_rows() and show_message(), so late fetches are dropped
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings")
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(expand=True, fill="both")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda event: self._scroll_by(-1 if event.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda event: self._scroll_by(-1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self._scroll_by(1, "units"))
+        self.tree.bind("<Prior>", lambda event: self._scroll_by(-1, "pages"))
+        self.tree.bind("<Next>", lambda event: self._scroll_by(1, "pages"))
+
+    def set_rows(self, keys):
+        """Shows a new list of rows, starting from the top."""
+        self.keys = list(keys)
+        self.values_cache = {}
+        self.generation += 1
+        self.message = None
+        self.top = 0
+        self._render()
+
+    def show_message(self, text):
+        """Replaces the rows with a single message row (used for errors)."""
+        self.keys = []
+        self.values_cache = {}
+        self.generation += 1
+        self.message = text
+        self._render()
+
+    def _row_height(self):
+        return int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+
+    def _on_resize(self, event):
+        # Leave room for the heading row
+        visible = max(1, (event.height - self._row_height() - 4) // self._row_height())
+        if visible != self.visible:
+            self.visible = visible
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.keys))
+            self._render()
+        else:
+            self._scroll_by(int(amount), unit)
+
+    def _scroll_by(self, amount, unit):
+        step = self.visible if unit == "pages" else 3
+        self.top += amount * step
+        self._render()
+        return "break"
+
+    def _message_row(self, text):
+        row = [""] * len(self.tree["columns"])
+        row[self.message_column] = text
+        return tuple(row)
+
+    def _fetch(self, start, end):
+        """Loads the values for rows start..end that are not cached yet on the worker,
+           then renders again. One fetch runs at a time; the render after it fetches
+           whatever the user scrolled to in the meantime.
+        """
+        missing = [key for key in self.keys[start:end] if key not in self.values_cache]
+        if self.fetching or not missing:
+            return
+        generation = self.generation
+
+        def fetched(values):
+            self.fetching = False
+            if generation == self.generation:
+                values = list(values or [])
+                # Keys left without values show a placeholder instead of being fetched again
+                values += [self._message_row("N/A")] * (len(missing) - len(values))
+                self.values_cache.update(zip(missing, values))
+            self._render()
+
+        def failed(e):
+            self.fetching = False
+            if generation == self.generation:
+                self.show_message(f"Error: {e}")
+            else:
+                self._render()
+
+        self.fetching = True
+        task_runner.submit(self.tree, lambda task: self.load_values(missing), fetched, failed)
+
+    def _render(self):
+        total = len(self.keys)
+        self.top = max(0, min(self.top, total - self.visible))
+        window = self.keys[self.top:self.top + self.visible]
+        if window and any(key not in self.values_cache for key in window):
+            self._fetch(max(0, self.top - self.BUFFER_ROWS), self.top + self.visible + self.BUFFER_ROWS)
+
+        if not window:
+            rows = [self._message_row(self.message or self.empty_text)]
+        else:
+            loading = self._message_row("Loading...")
+            rows = [self.values_cache.get(key, loading) for key in window]
+
+        # Reuse the existing items; only add or remove the difference
+        items = list(self.tree.get_children())
+        for item in items[len(rows):]:
+            self.tree.delete(item)
+        for i, values in enumerate(rows):
+            if i < len(items):
+                self.tree.item(items[i], values=values)
+            else:
+                self.tree.insert("", tk.END, values=values)
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+class TaskCancelled(Exception):
+    """Raised inside a background task once it notices it was cancelled."""
+
+class BackgroundTask:
+    """Handle for one job submitted to a BackgroundTaskRunner. The work function
+       receives it to report progress and to check for cancellation.
+    """
+
+    def __init__(self, widget, on_done, on_error, on_progress, on_cancelled):
+        self.widget = widget
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancelled = on_cancelled
+        self._cancelled = threading.Event()
+        self._events = None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, done, total, text=""):
+        """Called from the worker thread; on_progress(done, total, text) runs on the Tk thread."""
+        self._events.put((self, "progress", (done, total, text)))
+
+class BackgroundTaskRunner:
+    """Runs backend work off the Tk event thread so windows keep repainting.
+       The worker only queues results, errors and progress reports; an after()
+       poll on the Tk thread delivers them, so callbacks may update widgets.
+       A single worker runs the jobs in the order they were submitted, so a save
+       is never overtaken by the refresh that follows it. The backend guards its
+       own caches, so short lookups may still run on the Tk thread.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, max_workers=1):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix="backend-task")
+        self.events = queue.Queue()
+        self.pending = 0
+        self.polling = False
+
+    def submit(self, widget, work, on_done=None, on_error=None, on_progress=None, on_cancelled=None):
+        """Runs work(task) on the pool. Callbacks for a destroyed widget are dropped,
+           and a cancelled task only gets on_cancelled().
+        """
+        task = BackgroundTask(widget, on_done, on_error, on_progress, on_cancelled)
+        task._events = self.events
+        self.pending += 1
+        self.executor.submit(self._run, task, work)
+        if not self.polling:
+            self.polling = True
+            root = widget.nametowidget(".")
+            root.after(self.POLL_MS, self._poll, root)
+        return task
+
+    def _run(self, task, work):
+        try:
+            task.check_cancelled()
+            self.events.put((task, "done", work(task)))
+        except TaskCancelled:
+            self.events.put((task, "cancelled", None))
+        except Exception as e:
+            self.events.put((task, "error", e))
+
+    def _poll(self, root):
+        while True:
+            try:
+                task, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind != "progress":
+                self.pending -= 1
+            if task.cancelled and kind != "progress":
+                kind = "cancelled"
+            try:
+                if not task.widget.winfo_exists():
+                    continue
+                if kind == "done" and task.on_done:
+                    task.on_done(payload)
+                elif kind == "error":
+                    if task.on_error:
+                        task.on_error(payload)
+                    else:
+                        print(f"Background task failed: {payload}")
+                elif kind == "progress" and task.on_progress and not task.cancelled:
+                    task.on_progress(*payload)
+                elif kind == "cancelled" and task.on_cancelled:
+                    task.on_cancelled()
+            except tk.TclError:
+                pass  # The window was closed while the callback ran
+
+        self.polling = False
+        if self.pending:
+            try:
+                root.after(self.POLL_MS, self._poll, root)
+                self.polling = True
+            except tk.TclError:
+                pass  # The application is shutting down
+
+# Shared by every screen; see BackgroundTaskRunner
+task_runner = BackgroundTaskRunner()
+
 # ============================ ADMIN SCREENS ============================
 
 def open_add_admin_screen():
@@ -74,14 +327,19 @@ def open_add_admin_screen():
 def open_edit_citizen_screen():
     win = tk.Toplevel()
     win.title("Edit Citizen Info / Add Aid Record")
-    win.geometry("500x600")
+    win.geometry("500x750")
 
-    tk.Label(win, text="Search Citizen by National ID (9 digits)",
+    tk.Label(win, text="Search Citizen by National ID, Name or Address",
              font=("Helvetica", 14, "bold")).pack(pady=10)
 
-    search_entry = tk.Entry(win, width=20, font=("Helvetica", 12))
+    search_entry = tk.Entry(win, width=40, font=("Helvetica", 12))
     search_entry.pack(pady=5)
 
+    # Live matches for names and addresses, filled as the admin types
+    matches_listbox = tk.Listbox(win, width=70, height=6)
+    matches_listbox.pack(pady=5, padx=20)
+    matches = []
+
     result_label = tk.Label(win, text="", wraplength=450, justify="left")
     result_label.pack(pady=10)
 
@@ -104,23 +362,79 @@ def open_edit_citizen_screen():
     found_citizen_internal_id = None
     found_citizen = None
 
+    search_task = None
+    search_after_id = None
+
+    def show_matches(results):
+        matches[:] = results
+        matches_listbox.delete(0, tk.END)
+        for citizen in results:
+            matches_listbox.insert(tk.END, f"{citizen['full_name']} | {citizen['address']} "
+                                           f"| ID {citizen['national_id']} | Score {citizen['priority_score']}")
+        if not results and search_entry.get().strip():
+            matches_listbox.insert(tk.END, "No matching citizens.")
+
+    def run_live_search():
+        nonlocal search_task, search_after_id
+        search_after_id = None
+        query = search_entry.get().strip()
+        if search_task is not None:
+            search_task.cancel()  # Only the latest text matters
+        if not query or query.isdigit():
+            show_matches([])
+            return
+        search_task = task_runner.submit(win, lambda task: be.search_citizens(query, limit=20), show_matches,
+                                         lambda e: result_label.config(text=f"Search failed: {e}", fg="red"))
+
+    def on_search_typed(event):
+        nonlocal search_after_id
+        if event.keysym == "Return":
+            return
+        if search_after_id is not None:
+            win.after_cancel(search_after_id)
+        search_after_id = win.after(200, run_live_search)
+
+    def on_match_selected(event):
+        selection = matches_listbox.curselection()
+        if selection and selection[0] < len(matches):
+            search_entry.delete(0, tk.END)
+            search_entry.insert(0, matches[selection[0]]["national_id"])
+            search_citizen()
+
+    search_entry.bind("<KeyRelease>", on_search_typed)
+    search_entry.bind("<Return>", lambda event: search_citizen())
+    matches_listbox.bind("<<ListboxSelect>>", on_match_selected)
+
     def search_citizen():
+        nonlocal search_task, search_after_id
+        query = search_entry.get().strip()
+        # Enter can beat the debounced live search, so the shown matches may belong to
+        # an older query: drop the pending search and run one for the current text
+        if search_after_id is not None:
+            win.after_cancel(search_after_id)
+            search_after_id = None
+        if search_task is not None:
+            search_task.cancel()
+            search_task = None
+        if query and not query.isdigit():
+            def searched(results):
+                show_matches(results)
+                show_citizen(results[0]["national_id"] if results else query)  # Best name/address match
+
+            search_task = task_runner.submit(win, lambda task: be.search_citizens(query, limit=20), searched,
+                                             lambda e: result_label.config(text=f"Search failed: {e}", fg="red"))
+            return
+        show_citizen(query)
+
+    def show_citizen(national_id_search):
         nonlocal found_citizen_internal_id, found_citizen
-        national_id_search = search_entry.get().strip()
         if not national_id_search.isdigit() or len(national_id_search) != 9:
-            result_label.config(text="Invalid National ID format (must be 9 digits).", fg="red")
+            result_label.config(text="Enter a 9-digit National ID or pick a citizen from the matches.", fg="red")
             edit_frame.pack_forget()
             return
 
         try:
-            for citizen in be.read_csv_dict(be.CITIZENS_CSV_FILE, be.CITIZENS_FIELDNAMES):
-                if citizen.get("national_id") == national_id_search:
-                    is_active = citizen.get("is_active", "True").strip().lower() == "true"
-                    if is_active:
-                        found_citizen = citizen
-                        break
-            else:
-                found_citizen = None
+            found_citizen = be.find_citizen_by_national_id(national_id_search, active_only=True)
 
             if found_citizen:
                 found_citizen_internal_id = found_citizen.get("id")
@@ -157,53 +471,66 @@ def open_edit_citizen_screen():
             messagebox.showwarning("No Changes", "No changes provided to update.", parent=win)
             return
 
-        success_flags = []
-
         if next_date:
             try:
                 datetime.datetime.strptime(next_date, "%Y-%m-%d")
-                aid_success = be.save_aid_history_entry(
-                    citizen_internal_id=found_citizen_internal_id,
-                    entry_type="AdminEntry",
-                    date_str=datetime.datetime.now().strftime("%Y-%m-%d"),
-                    next_date_str=next_date
-                )
-                success_flags.append(aid_success)
             except ValueError:
                 messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD.", parent=win)
                 return
 
-        if message:
-            msg_success = be.save_message_entry(
-                citizen_internal_id=found_citizen_internal_id,
-                message=message
-            )
-            success_flags.append(msg_success)
-
+        score_float = None
         if new_score:
             try:
                 score_float = float(new_score)
-                updated_data = found_citizen.copy()
-                updated_data["priority_score"] = score_float
-                score_success = be.update_citizen_details_csv(found_citizen_internal_id, updated_data)
-                success_flags.append(score_success)
             except ValueError:
                 messagebox.showerror("Error", "Invalid score. Please enter a number.", parent=win)
                 return
 
-        if any(success_flags):
-            messagebox.showinfo("Success", "Aid record, message, and/or score updated successfully!", parent=win)
-            search_citizen()
-        else:
-            messagebox.showwarning("No Update", "No data was updated. Please check inputs.", parent=win)
+        citizen_internal_id, citizen = found_citizen_internal_id, found_citizen
+
+        def work(task):
+            success_flags = []
+            if next_date:
+                success_flags.append(be.save_aid_history_entry(
+                    citizen_internal_id=citizen_internal_id,
+                    entry_type="AdminEntry",
+                    date_str=datetime.datetime.now().strftime("%Y-%m-%d"),
+                    next_date_str=next_date
+                ))
+            if message:
+                success_flags.append(be.save_message_entry(
+                    citizen_internal_id=citizen_internal_id,
+                    message=message
+                ))
+            if score_float is not None:
+                updated_data = citizen.copy()
+                updated_data["priority_score"] = score_float
+                success_flags.append(be.update_citizen_details_csv(citizen_internal_id, updated_data))
+            return any(success_flags)
+
+        def saved(success):
+            save_button.config(state="normal")
+            if success:
+                messagebox.showinfo("Success", "Aid record, message, and/or score updated successfully!", parent=win)
+                search_citizen()
+            else:
+                messagebox.showwarning("No Update", "No data was updated. Please check inputs.", parent=win)
+
+        def failed(e):
+            save_button.config(state="normal")
+            messagebox.showerror("Error", f"Failed to save the changes: {e}", parent=win)
+
+        save_button.config(state="disabled")
+        task_runner.submit(win, work, saved, failed)
 
     # Place search button after defining the function
     tk.Button(win, text="🔍 Search", command=search_citizen,
               bg="#2196F3", fg="white", font=("Helvetica", 10, "bold")).pack(pady=5)
 
     # Place save button after defining the function
-    tk.Button(edit_frame, text="💾 Save Changes", command=save_changes,
-              bg="#4CAF50", fg="white", font=("Helvetica", 10, "bold")).pack(pady=10)
+    save_button = tk.Button(edit_frame, text="💾 Save Changes", command=save_changes,
+                            bg="#4CAF50", fg="white", font=("Helvetica", 10, "bold"))
+    save_button.pack(pady=10)
 
 def open_sorted_citizens_screen():
     win = tk.Toplevel()
@@ -213,12 +540,42 @@ def open_sorted_citizens_screen():
     tk.Label(win, text="Citizens Sorted by Highest Priority Score", 
              font=("Helvetica", 16, "bold")).pack(pady=10)
 
+    # Most of the time staff only work the top of the list
+    show_frame = tk.Frame(win)
+    show_frame.pack()
+    tk.Label(show_frame, text="Show:", font=("Helvetica", 11, "bold")).pack(side="left", padx=5)
+    show_limits = {"Top 100": 100, "Top 500": 500, "Top 1000": 1000, "All": None}
+    show_var = tk.StringVar(value="Top 500")
+    show_menu = ttk.Combobox(show_frame, textvariable=show_var, values=list(show_limits),
+                             state="readonly", width=10)
+    show_menu.pack(side="left", padx=5)
+
+    message_label = tk.Label(win, text="", font=("Helvetica", 12))
+    message_label.pack()
+
     # Create frame for the treeview and scrollbar
     tree_frame = tk.Frame(win)
     tree_frame.pack(expand=True, fill="both", padx=20, pady=10)
 
+    loaded_records = {}
+
+    def load_values(citizen_ids):
+        rows = []
+        for citizen_id in citizen_ids:
+            citizen = loaded_records.get(citizen_id) or be.get_citizen_details_csv(citizen_id) or {}
+            rows.append((
+                citizen.get("id", citizen_id),
+                citizen.get("national_id", "N/A"),
+                citizen.get("full_name", "N/A"),
+                citizen.get("phone_number", "N/A"),
+                f"{citizen.get('priority_score', 0.0):.1f}"
+            ))
+        return rows
+
+    # Only the visible rows are in the tree; the rest are fetched while scrolling
     columns = ("internal_id", "national_id", "full_name", "phone_number", "priority_score")
-    tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+    citizen_table = VirtualTreeview(tree_frame, columns, load_values, empty_text="No active citizens found.")
+    tree = citizen_table.tree
     
     tree.heading("internal_id", text="Internal ID")
     tree.heading("national_id", text="National ID")
@@ -232,31 +589,300 @@ def open_sorted_citizens_screen():
     tree.column("phone_number", width=120)
     tree.column("priority_score", width=80, anchor="e")
 
-    # Add scrollbar
-    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
-    tree.configure(yscrollcommand=scrollbar.set)
-    scrollbar.pack(side="right", fill="y")
-    tree.pack(expand=True, fill="both")
+    def load_ranking(limit):
+        if limit is None:
+            return be.get_citizen_ids(sort_by="priority_score"), {}
+        # top_k_by_priority reads an index kept sorted by the backend: O(k) per open
+        top_citizens = be.top_k_by_priority(limit)
+        return [citizen["id"] for citizen in top_citizens], {citizen["id"]: citizen for citizen in top_citizens}
+
+    def show_citizens(result):
+        sorted_citizen_ids, records = result
+        loaded_records.clear()
+        loaded_records.update(records)
+        if not sorted_citizen_ids:
+            message_label.config(text="No active citizens found.", fg="orange")
+        else:
+            message_label.config(text="")
+        citizen_table.set_rows(sorted_citizen_ids)
+
+    def show_error(e):
+        citizen_table.show_message("")
+        message_label.config(text=f"Error loading citizen data: {e}", fg="red")
+
+    load_task = None
+
+    def load_citizens(event=None):
+        nonlocal load_task
+        if load_task is not None:
+            load_task.cancel()
+        # Load in the background so the window opens and repaints immediately
+        citizen_table.show_message("Loading citizens...")
+        limit = show_limits[show_var.get()]
+        load_task = task_runner.submit(win, lambda task: load_ranking(limit), show_citizens, show_error)
 
-    try:
-        sorted_citizens = be.get_citizens_list_csv(sort_by="priority_score")
+    load_citizens()
+    show_menu.bind("<<ComboboxSelected>>", load_citizens)
+    win.bind("<Destroy>", lambda event: load_task.cancel() if event.widget is win else None)
 
-        if not sorted_citizens:
-            tk.Label(win, text="No active citizens found.", fg="orange", 
-                    font=("Helvetica", 12)).pack()
+def open_due_for_aid_screen():
+    win = tk.Toplevel()
+    win.title("Citizens Due for Aid")
+    win.geometry("900x600")
+
+    tk.Label(win, text="Citizens Due for Aid by Next Aid Date",
+             font=("Helvetica", 16, "bold")).pack(pady=10)
+
+    query_frame = tk.Frame(win)
+    query_frame.pack()
+    today = datetime.date.today()
+    tk.Label(query_frame, text="From (YYYY-MM-DD):").pack(side="left", padx=5)
+    from_entry = tk.Entry(query_frame, width=12)
+    from_entry.insert(0, today.isoformat())
+    from_entry.pack(side="left")
+    tk.Label(query_frame, text="To:").pack(side="left", padx=5)
+    to_entry = tk.Entry(query_frame, width=12)
+    to_entry.insert(0, (today + datetime.timedelta(days=7)).isoformat())
+    to_entry.pack(side="left")
+    tk.Label(query_frame, text="Region:").pack(side="left", padx=5)
+    region_entry = tk.Entry(query_frame, width=15)
+    region_entry.pack(side="left")
+    show_limits = {"Top 100": 100, "Top 500": 500, "Top 1000": 1000, "All": None}
+    show_var = tk.StringVar(value="Top 500")
+    ttk.Combobox(query_frame, textvariable=show_var, values=list(show_limits),
+                 state="readonly", width=10).pack(side="left", padx=5)
+
+    message_label = tk.Label(win, text="", font=("Helvetica", 12))
+    message_label.pack()
+
+    tree_frame = tk.Frame(win)
+    tree_frame.pack(expand=True, fill="both", padx=20, pady=10)
+
+    loaded_records = {}
+    next_dates = {}
+
+    def load_values(citizen_ids):
+        rows = []
+        for citizen_id in citizen_ids:
+            citizen = loaded_records.get(citizen_id) or be.get_citizen_details_csv(citizen_id) or {}
+            rows.append((
+                citizen.get("id", citizen_id),
+                citizen.get("national_id", "N/A"),
+                citizen.get("full_name", "N/A"),
+                citizen.get("phone_number", "N/A"),
+                f"{citizen.get('priority_score', 0.0):.1f}",
+                citizen.get("next_date") or next_dates.get(str(citizen_id), "")
+            ))
+        return rows
+
+    columns = ("internal_id", "national_id", "full_name", "phone_number", "priority_score", "next_date")
+    citizen_table = VirtualTreeview(tree_frame, columns, load_values, empty_text="No citizens are due in this period.")
+    tree = citizen_table.tree
+
+    tree.heading("internal_id", text="Internal ID")
+    tree.heading("national_id", text="National ID")
+    tree.heading("full_name", text="Name")
+    tree.heading("phone_number", text="Phone")
+    tree.heading("priority_score", text="Score")
+    tree.heading("next_date", text="Next Aid Date")
+
+    tree.column("internal_id", width=80, anchor="center")
+    tree.column("national_id", width=100, anchor="center")
+    tree.column("full_name", width=200)
+    tree.column("phone_number", width=120)
+    tree.column("priority_score", width=80, anchor="e")
+    tree.column("next_date", width=110, anchor="center")
+
+    def load_due(start, end, region, limit):
+        if limit is None:
+            # Only the IDs of a long list; dates and details are fetched while scrolling
+            citizen_ids = be.due_citizen_ids(start, end, region)
+            if citizen_ids is None:
+                raise ValueError("Enter the dates as YYYY-MM-DD.")
+            return citizen_ids, {}, be.get_latest_next_dates()
+        citizens = be.due_between(start, end, region, limit=limit)
+        if citizens is None:
+            raise ValueError("Enter the dates as YYYY-MM-DD.")
+        return [citizen["id"] for citizen in citizens], {citizen["id"]: citizen for citizen in citizens}, {}
+
+    def show_citizens(result):
+        citizen_ids, records, dates = result
+        loaded_records.clear()
+        loaded_records.update(records)
+        next_dates.clear()
+        next_dates.update(dates)
+        if citizen_ids:
+            message_label.config(text=f"{len(citizen_ids)} citizens shown, highest priority first.", fg="black")
         else:
-            for citizen in sorted_citizens:
-                tree.insert("", tk.END, values=(
-                    citizen.get("id", "N/A"),
-                    citizen.get("national_id", "N/A"),
-                    citizen.get("full_name", "N/A"),
-                    citizen.get("phone_number", "N/A"),
-                    f"{citizen.get('priority_score', 0.0):.1f}"
-                ))
+            message_label.config(text="No citizens are due in this period.", fg="orange")
+        citizen_table.set_rows(citizen_ids)
+
+    def show_error(e):
+        citizen_table.show_message("")
+        message_label.config(text=f"Error loading due citizens: {e}", fg="red")
+
+    load_task = None
+
+    def load_citizens(event=None):
+        nonlocal load_task
+        if load_task is not None:
+            load_task.cancel()
+        citizen_table.show_message("Loading citizens...")
+        start, end = from_entry.get().strip(), to_entry.get().strip()
+        region = region_entry.get().strip() or None
+        limit = show_limits[show_var.get()]
+        load_task = task_runner.submit(win, lambda task: load_due(start, end, region, limit), show_citizens, show_error)
+
+    tk.Button(query_frame, text="🔍 Show", command=load_citizens,
+              bg="#2196F3", fg="white").pack(side="left", padx=5)
+    for entry in (from_entry, to_entry, region_entry):
+        entry.bind("<Return>", load_citizens)
+
+    load_citizens()
+    win.bind("<Destroy>", lambda event: load_task.cancel() if event.widget is win and load_task else None)
+
+def open_distribution_planner_screen():
+    win = tk.Toplevel()
+    win.title("Distribution Planner")
+    win.geometry("950x650")
+
+    tk.Label(win, text="Plan a Distribution Day by Available Stock",
+             font=("Helvetica", 16, "bold")).pack(pady=10)
+
+    # Units in stock per aid type; a household takes one unit per few members
+    stock_frame = tk.Frame(win)
+    stock_frame.pack()
+    stock_entries = {}
+    for column, entry_type in enumerate(be.AID_ENTRY_TYPES):
+        tk.Label(stock_frame, text=entry_type.replace("_", " ").title()).grid(row=0, column=column, padx=8)
+        stock_entry = tk.Entry(stock_frame, width=12)
+        stock_entry.insert(0, "0")
+        stock_entry.grid(row=1, column=column, padx=8)
+        stock_entries[entry_type] = stock_entry
+
+    options_frame = tk.Frame(win)
+    options_frame.pack(pady=5)
+    tk.Label(options_frame, text="Distribution date (YYYY-MM-DD):").pack(side="left", padx=5)
+    date_entry = tk.Entry(options_frame, width=12)
+    date_entry.insert(0, datetime.date.today().isoformat())
+    date_entry.pack(side="left")
+    tk.Label(options_frame, text="Cooldown (days):").pack(side="left", padx=5)
+    cooldown_entry = tk.Entry(options_frame, width=5)
+    cooldown_entry.insert(0, str(be.DEFAULT_COOLDOWN_DAYS))
+    cooldown_entry.pack(side="left")
+    tk.Label(options_frame, text="Region:").pack(side="left", padx=5)
+    region_entry = tk.Entry(options_frame, width=15)
+    region_entry.pack(side="left")
+
+    summary_label = tk.Label(win, text="", font=("Helvetica", 10), justify="left")
+    summary_label.pack(pady=5)
+
+    tree_frame = tk.Frame(win)
+    tree_frame.pack(expand=True, fill="both", padx=20, pady=5)
+
+    current_plan = None
+    previewed_form = None
+
+    def load_values(positions):
+        allocations = current_plan["allocations"] if current_plan else []
+        return [(allocations[i]["entry_type"], allocations[i]["citizen_id"], allocations[i]["full_name"],
+                 allocations[i]["phone_number"], allocations[i]["household_members"], allocations[i]["units"],
+                 f"{allocations[i]['priority_score']:.1f}") for i in positions]
+
+    columns = ("entry_type", "internal_id", "full_name", "phone_number", "household", "units", "priority_score")
+    plan_table = VirtualTreeview(tree_frame, columns, load_values, empty_text="Enter the stock and preview a plan.")
+    tree = plan_table.tree
+    for column, heading, width in (("entry_type", "Aid Type", 140), ("internal_id", "ID", 60),
+                                   ("full_name", "Name", 200), ("phone_number", "Phone", 120),
+                                   ("household", "Household", 80), ("units", "Units", 60),
+                                   ("priority_score", "Score", 60)):
+        tree.heading(column, text=heading)
+        tree.column(column, width=width, anchor="w" if column == "full_name" else "center")
+
+    button_frame = tk.Frame(win)
+    button_frame.pack(pady=10)
+
+    def read_form():
+        stock = {}
+        for entry_type, stock_entry in stock_entries.items():
+            units = int(stock_entry.get().strip() or 0)
+            if units < 0:
+                raise ValueError("Stock cannot be negative.")
+            if units:
+                stock[entry_type] = units
+        if not stock:
+            raise ValueError("Enter the units in stock for at least one aid type.")
+        region = region_entry.get().strip()
+        return (stock, date_entry.get().strip(), int(cooldown_entry.get().strip()),
+                {"region": region} if region else None)
+
+    def describe(plan):
+        lines = [f"Plan for {plan['date']}: {len(plan['allocations'])} allocations from {plan['candidates']} active citizens."]
+        for entry_type, result in plan["by_type"].items():
+            lines.append(f"{entry_type}: {result['recipients']} households, {result['allocated']}/{result['stock']} units "
+                         f"({result['in_cooldown']} in cooldown, {result['waiting']} still waiting)")
+        return "\n".join(lines)
+
+    def show_plan(plan):
+        nonlocal current_plan
+        if plan is None:
+            messagebox.showerror("Error", "The plan could not be made. Check the date and stock.", parent=win)
+            return
+        current_plan = plan
+        summary_label.config(text=describe(plan) + ("" if plan["dry_run"] else "\nSaved as pending aid entries."))
+        plan_table.set_rows(range(len(plan["allocations"])))
+        save_button.config(state="normal" if plan["dry_run"] and plan["allocations"] else "disabled")
+        export_button.config(state="normal" if plan["allocations"] else "disabled")
+
+    def show_error(e):
+        messagebox.showerror("Error", f"Planning failed: {e}", parent=win)
 
-    except Exception as e:
-        tk.Label(win, text=f"Error loading citizen data: {e}", fg="red",
-                font=("Helvetica", 12)).pack()
+    def preview_plan():
+        nonlocal previewed_form
+        try:
+            previewed_form = stock, day, cooldown, criteria = read_form()
+        except ValueError as e:
+            messagebox.showerror("Invalid Input", str(e), parent=win)
+            return
+        save_button.config(state="disabled")
+        plan_table.show_message("Planning...")
+        task_runner.submit(win, lambda task: be.plan_distribution(stock, day, cooldown, filter_criteria=criteria,
+                                                                  dry_run=True), show_plan, show_error)
+
+    def save_plan():
+        if not messagebox.askyesno("Save Plan", describe(current_plan) + "\n\nSave these as pending aid entries?",
+                                   parent=win):
+            return
+        # Plan again with the previewed settings; the append happens under the aid history lock
+        stock, day, cooldown, criteria = previewed_form
+        save_button.config(state="disabled")
+        task_runner.submit(win, lambda task: be.plan_distribution(stock, day, cooldown, filter_criteria=criteria),
+                           show_plan, show_error)
+
+    def export_plan():
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel Files", "*.xlsx")],
+                                                 title="Save Distribution Plan", parent=win)
+        if not file_path:
+            return
+        plan = current_plan
+
+        def exported(result):
+            rows, sheets = result
+            messagebox.showinfo("Success", f"Exported {rows} allocations ({sheets} worksheet(s)) to:\n{file_path}",
+                                parent=win)
+
+        task_runner.submit(win, lambda task: excel_export.export_distribution_plan_to_excel(file_path, plan),
+                           exported, lambda e: messagebox.showerror("Export Error", f"Failed to export the plan:\n{e}",
+                                                                    parent=win))
+
+    tk.Button(button_frame, text="🔍 Preview Plan", command=preview_plan,
+              bg="#2196F3", fg="white", font=("Helvetica", 10, "bold")).pack(side="left", padx=5)
+    save_button = tk.Button(button_frame, text="💾 Save Plan", command=save_plan, state="disabled",
+                            bg="#4CAF50", fg="white", font=("Helvetica", 10, "bold"))
+    save_button.pack(side="left", padx=5)
+    export_button = tk.Button(button_frame, text="Export to Excel", command=export_plan, state="disabled",
+                              bg="#FF9800", fg="white", font=("Helvetica", 10, "bold"))
+    export_button.pack(side="left", padx=5)
 
 def open_admin_panel():
     win = tk.Toplevel()
@@ -276,6 +902,8 @@ def open_admin_panel():
     menu_bar.add_cascade(label="Admin Actions", menu=admin_menu)
     admin_menu.add_command(label="👤 Add New Admin", command=open_add_admin_screen)
     admin_menu.add_command(label="📊 View Sorted Citizens (by Score)", command=open_sorted_citizens_screen)
+    admin_menu.add_command(label="📅 Citizens Due for Aid", command=open_due_for_aid_screen)
+    admin_menu.add_command(label="📦 Plan Distribution", command=open_distribution_planner_screen)
     
     menu_bar.add_command(label="🚪 Exit Dashboard", command=win.destroy)
 
@@ -298,13 +926,86 @@ def open_admin_panel():
                               state="readonly", width=15)
     filter_menu.pack(side="left", padx=5)
 
+    # Status bar for background loads and exports (packed before the table so it keeps its place)
+    status_frame = tk.Frame(win)
+    status_frame.pack(side="bottom", fill="x", padx=10, pady=5)
+    status_label = tk.Label(status_frame, text="Ready", anchor="w")
+    status_label.pack(side="left")
+    cancel_button = tk.Button(status_frame, text="Cancel", state="disabled")
+    cancel_button.pack(side="right", padx=5)
+    progress_bar = ttk.Progressbar(status_frame, mode="determinate", length=200)
+    progress_bar.pack(side="right")
+    active_tasks = []
+
+    def run_in_background(description, work, on_done, on_error=None):
+        """Runs work(task) on the task runner and shows its progress in the status bar."""
+        def finish(text="Ready"):
+            if task in active_tasks:
+                active_tasks.remove(task)
+            if not active_tasks:
+                progress_bar.stop()
+                progress_bar.config(mode="determinate", value=0)
+                cancel_button.config(state="disabled")
+                status_label.config(text=text)
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def failed(error):
+            finish(f"{description} failed.")
+            if on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Error", f"{description} failed:\n{error}", parent=win)
+
+        def progress(done_count, total, text):
+            progress_bar.stop()
+            progress_bar.config(mode="determinate", maximum=max(total, 1), value=done_count)
+            status_label.config(text=f"{text} ({done_count}/{total})")
+
+        task = task_runner.submit(win, work, done, failed, progress,
+                                  lambda: finish(f"{description} cancelled."))
+        active_tasks.append(task)
+        status_label.config(text=f"{description}...")
+        progress_bar.config(mode="indeterminate")
+        progress_bar.start(10)
+        cancel_button.config(state="normal")
+        return task
+
+    def cancel_tasks():
+        for task in active_tasks:
+            task.cancel()
+
+    cancel_button.config(command=cancel_tasks)
+    win.bind("<Destroy>", lambda event: cancel_tasks() if event.widget is win else None)
+
     # Citizen Table Frame
     table_frame = tk.Frame(win)
     table_frame.pack(pady=10, padx=10, expand=True, fill="both")
 
+    received_ids = set()  # Fetched once per list load, read by every window fetch
+
+    def load_citizen_values(citizen_ids):
+        rows = []
+        for citizen_id in citizen_ids:
+            citizen = be.get_citizen_details_csv(citizen_id) or {}
+            rows.append((
+                citizen_id,
+                citizen.get("national_id", "N/A"),
+                citizen.get("full_name", "N/A"),
+                citizen.get("phone_number", "N/A"),
+                f"{citizen.get('priority_score', 0.0):.1f}",
+                "Yes" if str(citizen_id) in received_ids else "No"
+            ))
+        return rows
+
+    # Only the visible rows are in the tree; the rest are fetched while scrolling
     citizen_columns = ("internal_id", "national_id", "full_name", "phone_number", 
                       "priority_score", "received_aid")
-    citizen_tree = ttk.Treeview(table_frame, columns=citizen_columns, show="headings")
+    citizen_table = VirtualTreeview(table_frame, citizen_columns, load_citizen_values,
+                                    empty_text="No active citizens found.")
+    citizen_tree = citizen_table.tree
     
     citizen_tree.heading("internal_id", text="ID")
     citizen_tree.heading("national_id", text="National ID")
@@ -319,43 +1020,33 @@ def open_admin_panel():
     citizen_tree.column("phone_number", width=120)
     citizen_tree.column("priority_score", width=60, anchor="e")
     citizen_tree.column("received_aid", width=100, anchor="center")
-    
-    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=citizen_tree.yview)
-    citizen_tree.configure(yscrollcommand=scrollbar.set)
-    scrollbar.pack(side="right", fill="y")
-    citizen_tree.pack(expand=True, fill="both")
 
-    def load_citizen_data(filter_status="All users"):
-        for item in citizen_tree.get_children():
-            citizen_tree.delete(item)
-            
-        try:
-            all_citizens = be.get_citizens_list_csv(sort_by="id")
-            
-            if not all_citizens:
-                citizen_tree.insert("", tk.END, values=("", "", "No active citizens found.", "", "", ""))
-                return
-
-            for citizen in all_citizens:
-                citizen_internal_id = citizen.get("id")
-                received_status = "Yes" if be.check_citizen_received_aid(citizen_internal_id) else "No"
-                
-                if (filter_status == "All users" or 
-                   (filter_status == "Received" and received_status == "Yes") or 
-                   (filter_status == "Not Received" and received_status == "No")):
-                    
-                    citizen_tree.insert("", tk.END, values=(
-                        citizen_internal_id,
-                        citizen.get("national_id", "N/A"),
-                        citizen.get("full_name", "N/A"),
-                        citizen.get("phone_number", "N/A"),
-                        f"{citizen.get('priority_score', 0.0):.1f}",
-                        received_status
-                    ))
+    load_task = None
 
-        except Exception as e:
+    def load_citizen_data(filter_status="All users"):
+        nonlocal load_task
+        if load_task is not None:
+            load_task.cancel()  # The newest filter wins
+
+        def work(task):
+            filter_criteria = None
+            if filter_status == "Received":
+                filter_criteria = {"received_aid": True}
+            elif filter_status == "Not Received":
+                filter_criteria = {"received_aid": False}
+            return be.get_citizen_ids(sort_by="id", filter_criteria=filter_criteria), be.get_received_aid_ids()
+
+        def done(result):
+            citizen_ids, received = result
+            received_ids.clear()
+            received_ids.update(received)
+            citizen_table.set_rows(citizen_ids)
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to load citizen data: {e}", parent=win)
-            citizen_tree.insert("", tk.END, values=("", "", f"Error: {e}", "", "", ""))
+            citizen_table.show_message(f"Error: {e}")
+
+        load_task = run_in_background("Loading citizens", work, done, failed)
 
     load_citizen_data()
 
@@ -369,103 +1060,105 @@ def open_admin_panel():
     tk.Label(stats_frame, text="📊 System Statistics", 
              font=("Arial", 14, "bold")).pack(pady=5)
 
-    stats_columns = ("Total Citizens", "Received Aid", "Not Received", "Aid Operations")
+    stats_columns = ("Total Citizens", "Active", "Received Aid", "Not Received", "Aid Operations", "Messages")
     stats_tree = ttk.Treeview(stats_frame, columns=stats_columns, show="headings", height=1)
     
     for col in stats_columns:
         stats_tree.heading(col, text=col)
-        stats_tree.column(col, width=150, anchor="center")
+        stats_tree.column(col, width=130, anchor="center")
     stats_tree.pack(pady=5)
 
-    def update_stats():
+    aid_types_label = tk.Label(stats_frame, text="", font=("Helvetica", 9))
+    aid_types_label.pack()
+
+    def show_stats(stats):
         for item in stats_tree.get_children():
             stats_tree.delete(item)
-            
-        try:
-            all_citizens = list(be.read_csv_dict(be.CITIZENS_CSV_FILE, be.CITIZENS_FIELDNAMES))
-            total_citizens = len(all_citizens)
-            
-            aid_history = be.read_aid_history()
-            total_aid_ops = len(aid_history)
-            
-            received_ids = set()
-            for citizen in all_citizens:
-                internal_id = citizen.get("id")
-                if internal_id and be.check_citizen_received_aid(internal_id):
-                    received_ids.add(internal_id)
-            received_count = len(received_ids)
-            
-            not_received = total_citizens - received_count 
-            
-            stats_tree.insert("", tk.END, values=(total_citizens, received_count, 
-                                                 not_received, total_aid_ops))
-            
-        except Exception as e:
-            stats_tree.insert("", tk.END, values=(f"Error: {e}", "", "", ""))
+        stats_tree.insert("", tk.END, values=(stats["total_citizens"], stats["active_citizens"],
+                                             stats["received_aid"], stats["not_received"],
+                                             stats["aid_operations"], stats["messages"]))
+        by_type = ", ".join(f"{entry_type or 'N/A'}: {count}"
+                            for entry_type, count in sorted(stats["aid_operations_by_type"].items()))
+        aid_types_label.config(text=f"Aid operations by type: {by_type}" if by_type else "")
+
+    def show_stats_error(e):
+        for item in stats_tree.get_children():
+            stats_tree.delete(item)
+        stats_tree.insert("", tk.END, values=(f"Error: {e}", "", "", "", "", ""))
+
+    def update_stats():
+        run_in_background("Computing statistics", lambda task: be.get_system_stats(),
+                          show_stats, show_stats_error)
 
     update_stats()
     tk.Button(stats_frame, text="Refresh Stats", command=update_stats,
               bg="#FF9800", fg="white", font=("Helvetica", 10, "bold")).pack(pady=5)
     
     def extract_to_excel():
-        try:
-            # Ask user where to save the Excel file
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel Files", "*.xlsx")],
-                title="Save Excel File"
-            )
-
-            if not file_path:
-                return  # User cancelled the save dialog
-
-            # Load citizen data from backend
-            citizens = be.get_citizens_list_csv(sort_by="id")
+        # Ask user where to save the Excel file
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel Files", "*.xlsx")],
+            title="Save Excel File"
+        )
 
-            # Create a new Excel workbook and worksheet
-            workbook = openpyxl.Workbook()
-            worksheet = workbook.active
-            worksheet.title = "Citizens Data"
+        if not file_path:
+            return  # User cancelled the save dialog
 
-            # Define table headers
-            headers = ["ID", "National ID", "Full Name", "Phone Number", "Priority Score", "Received Aid"]
-            worksheet.append(headers)
+        def work(task):
+            def progress(done_count, total):
+                task.check_cancelled()
+                task.report_progress(done_count, total, "Exporting citizens")
 
-            # Add each citizen's data as a row
-            for citizen in citizens:
-                citizen_id = citizen.get("id", "")
-                received_aid = "Yes" if be.check_citizen_received_aid(citizen_id) else "No"
-
-                row = [
-                    citizen_id,
-                    citizen.get("national_id", ""),
-                    citizen.get("full_name", ""),
-                    citizen.get("phone_number", ""),
-                    f"{citizen.get('priority_score', 0.0):.1f}",
-                    received_aid
-                ]
-                worksheet.append(row)
-
-            # Save workbook to selected file path
-            workbook.save(file_path)
+            return excel_export.export_citizens_to_excel(file_path, sort_by="id", progress=progress)
 
+        def exported(result):
+            rows, sheets = result
             messagebox.showinfo(
                 "Success",
-                f"Data exported successfully to:\n{file_path}",
+                f"Exported {rows} citizens ({sheets} worksheet(s)) to:\n{file_path}",
                 parent=win
             )
 
-        except Exception as e:
+        def failed(e):
             messagebox.showerror(
                 "Export Error",
                 f"Failed to export data:\n{e}",
                 parent=win
             )
 
+        run_in_background("Exporting to Excel", work, exported, failed)
+
     
     tk.Button(stats_frame, text="Extract Data", command=extract_to_excel,
           bg="#FF9800", fg="white", font=("Helvetica", 10, "bold")).pack(pady=5)
 
+    def recompute_scores():
+        def describe(report):
+            return (f"{report['changed']} of {report['citizens']} citizens get a new score "
+                    f"({report['raised']} raised, {report['lowered']} lowered).\n"
+                    f"Average score: {report['mean_before']} -> {report['mean_after']} "
+                    f"(average change {report['mean_abs_shift']})")
+
+        def recomputed(report):
+            if report is None:
+                messagebox.showerror("Error", "Failed to save the new priority scores.", parent=win)
+                return
+            messagebox.showinfo("Scores Updated", describe(report), parent=win)
+            load_citizen_data(filter_var.get())
+            update_stats()
+
+        def previewed(report):
+            if not report["changed"]:
+                messagebox.showinfo("Recompute Scores", "All scores already follow the scoring policy.", parent=win)
+            elif messagebox.askyesno("Recompute Scores", describe(report) + "\n\nApply the new scores?", parent=win):
+                run_in_background("Recomputing scores", lambda task: be.recompute_priority_scores(), recomputed)
+
+        run_in_background("Previewing new scores", lambda task: be.recompute_priority_scores(dry_run=True), previewed)
+
+    tk.Button(stats_frame, text="Recompute Scores", command=recompute_scores,
+              bg="#FF9800", fg="white", font=("Helvetica", 10, "bold")).pack(pady=5)
+
 # ========================== CITIZEN SYSTEM ==============================
 
 def open_register_screen():
@@ -543,11 +1236,6 @@ def open_register_screen():
             messagebox.showerror("Error", "Secret code must be at least 4 characters long.", parent=register_win)
             return
 
-        if be.check_citizen_exists_csv(national_id):
-            messagebox.showerror("Error", f"A citizen with National ID {national_id} already exists.", 
-                                parent=register_win)
-            return
-
         score = calculate_score(q1, q2, q3, q4)
 
         citizen_data = {
@@ -563,21 +1251,37 @@ def open_register_screen():
             "needs_description": ""
         }
 
-        registered_record = be.register_citizen_csv(citizen_data)
+        def work(task):
+            if be.check_citizen_exists_csv(national_id):
+                return "exists"
+            return be.register_citizen_csv(citizen_data)
+
+        def registered(registered_record):
+            register_button.config(state="normal")
+            if registered_record == "exists":
+                messagebox.showerror("Error", f"A citizen with National ID {national_id} already exists.", 
+                                    parent=register_win)
+            elif registered_record:
+                new_internal_id = registered_record.get("id")
+                messagebox.showinfo("Success", 
+                                  f"Registration successful!\nYour Internal System ID: {new_internal_id}\n"
+                                  f"Please keep this ID and your secret code for login.", 
+                                  parent=register_win)
+                open_citizen_login()
+                register_win.destroy()
+            else:
+                messagebox.showerror("Error", "Registration failed. Please try again.", parent=register_win)
 
-        if registered_record:
-            new_internal_id = registered_record.get("id")
-            messagebox.showinfo("Success", 
-                              f"Registration successful!\nYour Internal System ID: {new_internal_id}\n"
-                              f"Please keep this ID and your secret code for login.", 
-                              parent=register_win)
-            open_citizen_login()
-            register_win.destroy()
-        else:
-            messagebox.showerror("Error", "Registration failed. Please try again.", parent=register_win)
+        def failed(e):
+            register_button.config(state="normal")
+            messagebox.showerror("Error", f"Registration failed: {e}", parent=register_win)
 
-    tk.Button(form_frame, text="Register", font=("Helvetica", 12, "bold"), 
-              command=register, bg="#4CAF50", fg="white", height=2).pack(pady=20, fill="x")
+        register_button.config(state="disabled")
+        task_runner.submit(register_win, work, registered, failed)
+
+    register_button = tk.Button(form_frame, text="Register", font=("Helvetica", 12, "bold"), 
+                                command=register, bg="#4CAF50", fg="white", height=2)
+    register_button.pack(pady=20, fill="x")
 
 def open_citizen_login():
     login_win = tk.Toplevel()
@@ -941,10 +1645,25 @@ def create_main_window():
 
 # ========================== MAIN EXECUTION ==============================
 
+def parse_storage_args(argv):
+    """Reads --storage NAME and --data-dir PATH from the command line (None when absent).
+       Other arguments are left for Tk.
+    """
+    parser = argparse.ArgumentParser(description="Citizen Aid Management System")
+    parser.add_argument("--storage", choices=sorted(be.STORAGE_ENGINES),
+                        help="storage engine (default: CITIZEN_AID_STORAGE, else csv)")
+    parser.add_argument("--data-dir", help="folder holding the data files (default: CITIZEN_AID_DATA_DIR)")
+    args, _ = parser.parse_known_args(argv)
+    return args.storage, args.data_dir
+
 if __name__ == "__main__":
-    # Initialize backend
+    # Initialize backend (engine: --storage, else CITIZEN_AID_STORAGE, else csv)
+    storage_name, data_dir = parse_storage_args(sys.argv[1:])
+    be.configure_storage(storage_name, data_dir)
     be.setup_csv_files()
     
     # Create and run the main application
     root = create_main_window()
+    # The live citizen search then answers the first keystroke from a ready index
+    task_runner.submit(root, lambda task: be.warm_search_index())
     root.mainloop()
@@ -0,0 +1,68 @@
+# migrate_csv_to_sqlite.py - One-shot import of the CSV data files into SQLite
+
+import os
+import sys
+
+import backend_functions as be
+import sqlite_storage
+
+def migrate_csv_to_sqlite(db_path=be.SQLITE_DB_FILE, force=False):
+    """Imports the four CSV tables and their ID counters into a SQLite database."""
+    if os.path.exists(db_path) and not force:
+        print(f"✗ {db_path} already exists. Use --force to replace its tables.")
+        return False
+
+    source = be.CsvStorage(be.DATA_DIR)
+    store = sqlite_storage.SqliteStorage(db_path, be.TABLE_FIELDNAMES)
+    try:
+        for table in be.TABLE_FIELDNAMES:
+            csv_file = source.files[table]
+            rows = []
+            duplicates = []
+            seen_ids = set()
+            skipped = 0
+            # read_rows merges any pending change log over the CSV file
+            for row in source.read_rows(table):
+                try:
+                    row_id = int(row.get("id", ""))
+                except (ValueError, TypeError):
+                    skipped += 1
+                    continue
+                if row_id in seen_ids:
+                    duplicates.append(row)
+                    continue
+                seen_ids.add(row_id)
+                rows.append(row)
+            if skipped:
+                print(f"Warning: Skipped {skipped} {table} rows without a numeric ID in {os.path.basename(csv_file)}")
+            if duplicates:
+                # Rows that reused an existing ID get fresh IDs after the current maximum
+                next_id = max(seen_ids) + 1
+                for row in duplicates:
+                    row["id"] = str(next_id)
+                    next_id += 1
+                    rows.append(row)
+                print(f"Warning: Renumbered {len(duplicates)} {table} rows with duplicate IDs")
+            if store.overwrite_rows(table, rows):
+                print(f"✓ Imported {len(rows)} rows from {os.path.basename(csv_file)} into {table}")
+            else:
+                print(f"✗ Failed to import {os.path.basename(csv_file)}")
+                return False
+
+        # Missing counters are fine: the SQLite engine never hands out an ID below MAX(id)
+        for table in be.TABLE_FIELDNAMES:
+            counter_val = source.get_counter(table)
+            if counter_val is not None:
+                store.set_counter(table, counter_val)
+                print(f"✓ Imported {table} ID counter ({counter_val})")
+    finally:
+        store.close()
+
+    print(f"\nMigration complete. Start the app with CITIZEN_AID_STORAGE=sqlite to use {db_path}.")
+    return True
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    target = args[0] if args else be.SQLITE_DB_FILE
+    success = migrate_csv_to_sqlite(target, force="--force" in sys.argv[1:])
+    sys.exit(0 if success else 1)
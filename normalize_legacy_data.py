@@ -0,0 +1,246 @@
+# normalize_legacy_data.py - Rewrites legacy aid history and message files as canonical CSV
+#
+#   python normalize_legacy_data.py                 normalize aid_history.csv and messages.csv
+#   python normalize_legacy_data.py --dry-run       only report what would change
+#   python normalize_legacy_data.py --file old.csv --table messages --output new.csv
+#
+# Older exports wrap each row in quotes with tab-separated values inside, start with a
+# byte order mark, or use other encodings, and write dates like "27. 04. 2025" and
+# "04. 27. 2025  12:00:00 AM". The files are rewritten in one streaming pass as
+# comma-separated UTF-8 with ISO-8601 dates; the new file replaces the old one atomically.
+
+import argparse
+import codecs
+import csv
+import os
+import sys
+import tempfile
+
+import backend_functions as be
+
+SNIFF_BYTES = 64 * 1024
+FALLBACK_ENCODING = "cp1256"  # Windows Arabic, used by older office exports
+DELIMITERS = ",\t;|"
+
+# {table: {field: (kind, day_first)}}: the legacy aid "date" column is day-first,
+# the other columns month-first
+DATE_FIELDS = {
+    "aid_history": {"date": ("date", True), "next_date": ("date", False), "timestamp": ("datetime", False)},
+    "messages": {"timestamp": ("datetime", False)},
+}
+INTEGER_FIELDS = ("id", "citizen_internal_id")
+
+def detect_encoding(file_path):
+    """Returns the encoding of a text file: from its byte order mark, UTF-8 if the
+       start of the file decodes as UTF-8, and FALLBACK_ENCODING otherwise.
+    """
+    with open(file_path, "rb") as f:
+        sample = f.read(SNIFF_BYTES)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+def detect_delimiter(file_path, encoding):
+    """Guesses the delimiter from the start of the file (comma if unsure)."""
+    with open(file_path, "r", newline="", encoding=encoding, errors="replace") as f:
+        sample = f.read(SNIFF_BYTES)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+def _split_values(values, width):
+    """Splits a record read as one field (a whole legacy row wrapped in quotes, or a
+       row written with a different delimiter than the rest of the file).
+    """
+    if len(values) == 1 and width > 1:
+        for delimiter in DELIMITERS:
+            if delimiter in values[0]:
+                parts = next(csv.reader([values[0]], delimiter=delimiter), [])
+                if len(parts) == width:
+                    return parts
+    return values
+
+def _normalize_row(table, row):
+    """Converts the date fields of a row to ISO-8601. Returns the number of date
+       values that could not be parsed (those are kept as they were).
+    """
+    unparsed = 0
+    for field, (kind, day_first) in DATE_FIELDS.get(table, {}).items():
+        value = row.get(field, "").strip()
+        parsed = be.parse_date_text(value, day_first) if value else None
+        if parsed is not None:
+            row[field] = parsed.date().isoformat() if kind == "date" else parsed.isoformat()
+        else:
+            row[field] = value
+            unparsed += value != ""
+    return unparsed
+
+def normalize_csv_file(table, source_path, target_path=None, rejected_path=None, dry_run=False):
+    """Streams source_path into canonical CSV at target_path (default: replace the source).
+       Blank rows are dropped, missing or repeated IDs get new ones above the highest
+       ID seen, and rows without a numeric citizen_internal_id or with the wrong number
+       of values are moved to rejected_path (default "<name>.rejected.csv") with a reason.
+       Returns a report dict, or None if the file could not be read or written.
+    """
+    fieldnames = be.TABLE_FIELDNAMES[table]
+    target_path = target_path or source_path
+    rejected_path = rejected_path or f"{os.path.splitext(target_path)[0]}.rejected.csv"
+    report = {"table": table, "file": source_path, "rows": 0, "changed": 0, "blank": 0, "renumbered": 0,
+              "rejected": 0, "unparsed_dates": 0, "max_id": 0, "encoding": None, "delimiter": None, "rewritten": False}
+    temp_path = None
+    try:
+        report["encoding"] = encoding = detect_encoding(source_path)
+        report["delimiter"] = delimiter = detect_delimiter(source_path, encoding)
+        directory = os.path.dirname(os.path.abspath(target_path))
+        temp_fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(target_path) + ".tmp")
+        rejected = []
+        with open(source_path, "r", newline="", encoding=encoding) as source, \
+             os.fdopen(temp_fd, "w", newline="", encoding="utf-8") as target:
+            reader = csv.reader(source, delimiter=delimiter)
+            writer = csv.writer(target, quoting=csv.QUOTE_MINIMAL)
+            columns = [name.strip().lstrip("\ufeff") for name in _split_values(next(reader, []), len(fieldnames))]
+            missing = [field for field in fieldnames if field not in columns]
+            if missing:
+                raise ValueError(f"no {', '.join(missing)} column(s); is it a {table} file?")
+            writer.writerow(fieldnames)
+
+            seen_ids = set()
+            for values in reader:
+                split = _split_values(values, len(columns))
+                if not any(value.strip() for value in split):
+                    report["blank"] += 1
+                    continue
+                row = dict(zip(columns, split))
+                if len(split) != len(columns):
+                    rejected.append(dict(row, reason=f"{len(split)} values, expected {len(columns)}"))
+                    continue
+                if not row["citizen_internal_id"].strip().isdigit():
+                    rejected.append(dict(row, reason="citizen_internal_id is not a number"))
+                    continue
+                original = [row.get(field, "") for field in fieldnames]
+                report["unparsed_dates"] += _normalize_row(table, row)
+                row["citizen_internal_id"] = str(int(row["citizen_internal_id"]))
+                row_id = int(row["id"]) if row["id"].strip().isdigit() else None
+                if row_id is None or row_id in seen_ids:
+                    row_id = report["max_id"] + 1
+                    report["renumbered"] += 1
+                seen_ids.add(row_id)
+                report["max_id"] = max(report["max_id"], row_id)
+                row["id"] = str(row_id)
+
+                output = [row.get(field, "") for field in fieldnames]
+                report["rows"] += 1
+                report["changed"] += output != original or split is not values
+                writer.writerow(output)
+            target.flush()
+            os.fsync(target.fileno())
+
+        report["rejected"] = len(rejected)
+        canonical = (encoding == "utf-8" and delimiter == "," and columns == fieldnames and
+                     not (report["changed"] or report["blank"] or report["rejected"]))
+        if dry_run or (canonical and target_path == source_path):
+            os.remove(temp_path)
+            return report
+        if rejected:
+            append_header = not os.path.isfile(rejected_path)
+            with open(rejected_path, "a", newline="", encoding="utf-8") as f:
+                rejected_writer = csv.DictWriter(f, fieldnames=fieldnames + ["reason"], extrasaction="ignore")
+                if append_header:
+                    rejected_writer.writeheader()
+                rejected_writer.writerows(rejected)
+        os.replace(temp_path, target_path)
+        report["rewritten"] = True
+        return report
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"✗ Normalizing {source_path} failed: {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+def normalize_table(table, dry_run=False):
+    """Normalizes one table's CSV file in place while holding its lock, then clears the
+       cached rows and moves the table's ID counter past the highest ID.
+    """
+    storage = be.get_storage()
+    if not isinstance(storage, be.CsvStorage):
+        print(f"✗ The {storage.name} engine is not supported; this tool rewrites the CSV data files.")
+        return None
+    with be.locked_table(table):
+        if not dry_run and not storage.compact(table):
+            print(f"✗ Could not fold the pending changes into {storage.files[table]}.")
+            return None
+        report = normalize_csv_file(table, storage.files[table], dry_run=dry_run)
+        if report is not None and report["rewritten"]:
+            be.invalidate_table_cache(table)
+            counter = storage.get_counter(table)
+            if counter is not None and counter < report["max_id"]:
+                storage.set_counter(table, report["max_id"])
+    return report
+
+def typed_row(table, row):
+    """Converts a stored row to Python types: int IDs (None if invalid), datetime.date
+       for date fields and datetime.datetime for timestamps (None if empty or invalid).
+    """
+    typed = dict(row)
+    for field in INTEGER_FIELDS:
+        value = row.get(field, "").strip()
+        typed[field] = int(value) if value.isdigit() else None
+    for field, (kind, day_first) in DATE_FIELDS.get(table, {}).items():
+        parsed = be.parse_date_text(row.get(field, ""), day_first)
+        typed[field] = parsed.date() if parsed is not None and kind == "date" else parsed
+    return typed
+
+def read_typed(table, citizen_internal_id=None):
+    """Returns aid history or message rows with typed values (see typed_row), optionally
+       for one citizen. Dates are parsed once per distinct value, so reading is cheap
+       even before the files are normalized.
+    """
+    if table == "aid_history":
+        rows = be.read_aid_history(citizen_internal_id)
+    elif table == "messages":
+        rows = be.read_messages(citizen_internal_id)
+    else:
+        raise ValueError(f"Unknown table {table!r}. Choose from: {', '.join(DATE_FIELDS)}")
+    return [typed_row(table, row) for row in rows]
+
+def _print_report(report, dry_run):
+    action = "would be" if dry_run else "were"
+    delimiter = {"\t": "tab", ",": "comma"}.get(report["delimiter"], repr(report["delimiter"]))
+    print(f"✓ {report['file']} ({report['encoding']}, {delimiter}-separated): {report['rows']} rows, "
+          f"{report['changed']} {action} rewritten, {report['renumbered']} renumbered, "
+          f"{report['blank']} blank and {report['rejected']} rejected rows {action} removed.")
+    if report["unparsed_dates"]:
+        print(f"  {report['unparsed_dates']} date values could not be parsed and were left as they are.")
+    if not dry_run and not report["rewritten"]:
+        print("  Already canonical; the file was not touched.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite legacy aid history and message files as canonical CSV.")
+    parser.add_argument("--table", choices=sorted(DATE_FIELDS), action="append",
+                        help="table to normalize (default: both)")
+    parser.add_argument("--file", help="normalize this file instead of the table's data file")
+    parser.add_argument("--output", help="with --file: write here instead of replacing the file")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+    tables = args.table or sorted(DATE_FIELDS)
+    if args.file and len(tables) != 1:
+        parser.error("--file needs exactly one --table")
+
+    success = True
+    for table in tables:
+        if args.file:
+            report = normalize_csv_file(table, args.file, args.output, dry_run=args.dry_run)
+        else:
+            report = normalize_table(table, args.dry_run)
+        if report is None:
+            success = False
+        else:
+            _print_report(report, args.dry_run)
+    sys.exit(0 if success else 1)
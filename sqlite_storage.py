@@ -0,0 +1,178 @@
+# sqlite_storage.py - SQLite storage engine for the citizen aid tables
+
+import sqlite3
+import threading
+
+# Secondary indexes created on top of the integer primary keys
+TABLE_INDEXES = {
+    "citizens": ["national_id"],
+    "admins": ["username"],
+    "aid_history": ["citizen_internal_id", "next_date"],
+    "messages": ["citizen_internal_id"],
+}
+
+class SqliteStorage:
+    """Stores the citizen aid tables in one SQLite database (WAL mode).
+       Rows go in and come out as dictionaries of strings, exactly like the CSV
+       files, so the backend functions can switch engines without converting data.
+    """
+
+    name = "sqlite"
+    indexed_lookups = True
+    point_updates = True
+
+    def __init__(self, db_path, table_fieldnames):
+        self.db_path = db_path
+        self.table_fieldnames = table_fieldnames
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            for table, fieldnames in self.table_fieldnames.items():
+                columns = ", ".join(f'"{field}" TEXT' for field in fieldnames if field != "id")
+                self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY, {columns})')
+                for field in TABLE_INDEXES.get(table, []):
+                    self._conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{field}" ON "{table}" ("{field}")')
+            self._conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS id_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.executemany("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)",
+                                   [(table,) for table in self.table_fieldnames])
+
+    def setup(self):
+        """The schema is created on connect; nothing else to prepare."""
+        print(f"SQLite storage ready at {self.db_path}.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def locked(self, table):
+        """Serializes this connection's writers; SQLite itself locks against other processes."""
+        return self._lock
+
+    # Reads
+    def _to_dict(self, table, row):
+        record = {field: ("" if row[field] is None else row[field]) for field in self.table_fieldnames[table]}
+        record["id"] = str(record["id"])
+        return record
+
+    def version(self, table):
+        """Returns a counter that changes whenever the table is written (by any process)."""
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return row["version"] if row else 0
+
+    def compacted_version(self, table, version):
+        """SQLite files are never compacted by the backend."""
+        return None
+
+    def read_rows(self, table):
+        """Returns all rows of a table in ID order."""
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM "{table}" ORDER BY id').fetchall()
+        return [self._to_dict(table, row) for row in rows]
+
+    def find_rows(self, table, field, value):
+        """Returns the rows whose field equals value, served by the column's index when it has one."""
+        if field == "id":
+            try:
+                value = int(value)
+            except (ValueError, TypeError):
+                return []
+        else:
+            value = str(value)
+        with self._lock:
+            rows = self._conn.execute(f'SELECT * FROM "{table}" WHERE "{field}" = ? ORDER BY id', (value,)).fetchall()
+        return [self._to_dict(table, row) for row in rows]
+
+    def exists(self, table, field, value):
+        """Checks whether any row has the given field value."""
+        with self._lock:
+            row = self._conn.execute(f'SELECT 1 FROM "{table}" WHERE "{field}" = ? LIMIT 1', (str(value),)).fetchone()
+        return row is not None
+
+    def max_id(self, table):
+        with self._lock:
+            row = self._conn.execute(f'SELECT MAX(id) AS max_id FROM "{table}"').fetchone()
+        return row["max_id"] or 0
+
+    # Writes
+    def _bump_version(self, table):
+        self._conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = ?", (table,))
+
+    def _row_values(self, table, row):
+        values = [row.get(field, "") for field in self.table_fieldnames[table]]
+        values[0] = int(values[0])
+        return values
+
+    def _insert_sql(self, table):
+        fieldnames = self.table_fieldnames[table]
+        columns = ", ".join(f'"{field}"' for field in fieldnames)
+        placeholders = ", ".join("?" for _ in fieldnames)
+        return f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})'
+
+    def append_rows(self, table, rows):
+        """Inserts rows in one transaction. Returns False if any row is rejected."""
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(self._insert_sql(table), [self._row_values(table, row) for row in rows])
+                self._bump_version(table)
+            return True
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print(f"Error inserting into SQLite table {table}: {e}")
+            return False
+
+    def update_row(self, table, row):
+        """Rewrites the stored row that has the same ID as the given row."""
+        fieldnames = self.table_fieldnames[table][1:]
+        assignments = ", ".join(f'"{field}" = ?' for field in fieldnames)
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(f'UPDATE "{table}" SET {assignments} WHERE id = ?',
+                                            [row.get(field, "") for field in fieldnames] + [int(row["id"])])
+                self._bump_version(table)
+            return cursor.rowcount == 1
+        except (sqlite3.Error, ValueError, TypeError, KeyError) as e:
+            print(f"Error updating SQLite table {table}: {e}")
+            return False
+
+    def overwrite_rows(self, table, rows):
+        """Replaces the whole content of a table in one transaction."""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(f'DELETE FROM "{table}"')
+                self._conn.executemany(self._insert_sql(table), [self._row_values(table, row) for row in rows])
+                self._bump_version(table)
+            return True
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print(f"Error overwriting SQLite table {table}: {e}")
+            return False
+
+    # ID counters
+    def reserve_ids(self, table, count=1):
+        """Advances the table's ID counter in one write transaction and returns the first
+           reserved ID. The counter never falls behind MAX(id), so it heals itself after
+           a migration or a manual edit.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT value FROM id_counters WHERE name = ?", (table,)).fetchone()
+            max_row = self._conn.execute(f'SELECT MAX(id) AS max_id FROM "{table}"').fetchone()
+            last_id = max(row["value"] if row else 0, max_row["max_id"] or 0)
+            self._conn.execute("INSERT OR REPLACE INTO id_counters (name, value) VALUES (?, ?)", (table, last_id + count))
+        return last_id + 1
+
+    def get_counter(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM id_counters WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def set_counter(self, name, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO id_counters (name, value) VALUES (?, ?)", (name, int(value)))
+        return True
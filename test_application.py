@@ -1,8 +1,28 @@
 # test_application.py - Automated testing script for the application
 
 import backend_functions as be
+import contextlib
+import datetime
 import sys
 import os
+import tempfile
+import time
+
+@contextlib.contextmanager
+def isolated_storage():
+    """Runs the block on an in-memory copy of the current data, then switches the
+       backend back to the engine and data directory it used before.
+    """
+    previous, previous_dir = be.get_storage(), be.DATA_DIR
+    tables = {table: previous.read_rows(table) for table in be.TABLE_FIELDNAMES}
+    try:
+        with tempfile.TemporaryDirectory() as empty_dir:
+            isolated = be.configure_storage("memory", empty_dir)
+            for table, rows in tables.items():
+                isolated.overwrite_rows(table, rows)
+            yield isolated
+    finally:
+        be.configure_storage(previous.name, previous_dir)
 
 def test_backend_functions():
     """Test all backend functions to ensure they work correctly."""
@@ -161,6 +181,16 @@ def test_backend_functions():
             print("✗ Messages read failed")
             return False
             
+        # A refresh after a new message picks it up from the appended tail
+        be.save_message_entry(citizen_internal_id=citizen_id, message="Second test message")
+        refreshed = be.read_messages(citizen_id)
+        all_for_citizen = [m for m in be.read_messages() if m.get("citizen_internal_id") == str(citizen_id)]
+        if len(refreshed) == len(messages) + 1 and refreshed == all_for_citizen:
+            print("✓ Inbox refresh successful")
+        else:
+            print("✗ Inbox refresh missed or duplicated messages")
+            return False
+            
     except Exception as e:
         print(f"✗ Message testing failed: {e}")
         return False
@@ -188,6 +218,328 @@ def test_backend_functions():
         print(f"✗ Citizens list testing failed: {e}")
         return False
     
+    # Test 7: System statistics
+    print("\n7. Testing system statistics...")
+    try:
+        stats = be.get_system_stats()
+        citizens = be.read_citizens()
+        if (stats["total_citizens"] == len(citizens) and
+            stats["received_aid"] + stats["not_received"] == stats["total_citizens"] and
+            stats["received_aid"] >= 1):
+            print(f"✓ System statistics computed successfully ({stats['total_citizens']} citizens)")
+        else:
+            print(f"✗ System statistics are inconsistent: {stats}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ System statistics testing failed: {e}")
+        return False
+    
+    # Test 8: Bulk citizen update
+    print("\n8. Testing bulk citizen update...")
+    try:
+        report = be.update_citizens_bulk({
+            citizen_id: {"priority_score": 7.5, "phone_number": "0508888888"},
+            "999999999": {"priority_score": 1.0}
+        })
+        updated = be.get_citizen_details_csv(citizen_id)
+        if (report[citizen_id]["success"] and not report["999999999"]["success"] and
+            updated["priority_score"] == 7.5 and updated["phone_number"] == "0508888888"):
+            print("✓ Bulk update applied changes and reported the unknown citizen")
+        else:
+            print(f"✗ Bulk update failed: {report}")
+            return False
+            
+        other = be.find_citizen_by_national_id("999888776") or be.register_citizen_csv({
+            "national_id": "999888776", "full_name": "Second Test Citizen", "secret_code": "testsecret456"})
+        report = be.update_citizens_bulk({citizen_id: {"national_id": other["national_id"]}})
+        if not report[citizen_id]["success"] and be.check_citizen_exists_csv("999888777"):
+            print("✓ Bulk update correctly rejects a duplicate National ID")
+        else:
+            print("✗ Bulk update allowed a duplicate National ID")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Bulk update testing failed: {e}")
+        return False
+    
+    # Test 9: Bulk citizen registration
+    print("\n9. Testing bulk citizen registration...")
+    try:
+        registered, rejected = be.register_citizens_bulk([
+            {"national_id": "999888701", "full_name": "Bulk Citizen", "secret_code": "bulk123"},
+            {"national_id": "999888701", "full_name": "Bulk Duplicate", "secret_code": "bulk456"},
+            {"national_id": "999888702", "full_name": "Missing Secret"}
+        ])
+        rejected_rows = {rejection["row"] for rejection in rejected}
+        if (be.verify_citizen_login_csv("999888701", "bulk123") and {1, 2} <= rejected_rows and
+            not be.check_citizen_exists_csv("999888702")):
+            print(f"✓ Bulk registration successful ({len(registered)} registered, {len(rejected)} rejected)")
+        else:
+            print(f"✗ Bulk registration failed: {rejected}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Bulk registration testing failed: {e}")
+        return False
+    
+    # Test 10: Paginated citizens list
+    print("\n10. Testing paginated citizens list...")
+    try:
+        expected_ids = [c["id"] for c in be.get_citizens_list_csv(sort_by="priority_score")]
+        paged_ids = []
+        cursor = None
+        while True:
+            page, cursor = be.get_citizens_page(sort_by="priority_score", limit=7, cursor=cursor)
+            paged_ids.extend(c["id"] for c in page)
+            if cursor is None:
+                break
+        top_ids = [c["id"] for c in be.top_k_by_priority(2)]
+        try:
+            be.get_citizens_page(limit=0)
+            rejects_bad_limit = False
+        except ValueError:
+            rejects_bad_limit = True
+        if (paged_ids == expected_ids and be.get_citizen_ids(sort_by="priority_score") == expected_ids and
+            top_ids == expected_ids[:2] and rejects_bad_limit):
+            print(f"✓ Paginated list matches the full list ({len(paged_ids)} citizens)")
+        else:
+            print("✗ Paginated list does not match the full list")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Paginated list testing failed: {e}")
+        return False
+    
+    # Test 11: Filtered citizens list
+    print("\n11. Testing citizen filters...")
+    try:
+        citizens = be.get_citizens_list_csv(sort_by="id")
+        received_ids = be.get_received_aid_ids()
+        criteria = {"priority_score": {"min": 1, "max": 50}, "received_aid": False}
+        expected_ids = [c["id"] for c in citizens
+                        if 1 <= c["priority_score"] <= 50 and str(c["id"]) not in received_ids]
+        region = next((be.citizen_region(c["address"]) for c in citizens if " - " in c["address"]), "")
+        region_ids = [c["id"] for c in citizens if be.citizen_region(c["address"]) == region]
+        if (be.get_citizen_ids(sort_by="id", filter_criteria=criteria) == expected_ids and
+            [c["id"] for c in be.get_citizens_list_csv(sort_by="id", filter_criteria=criteria)] == expected_ids and
+            be.get_citizen_ids(sort_by="id", filter_criteria={"region": region.upper()}) == region_ids):
+            print(f"✓ Filters match a manual scan ({len(expected_ids)} in range, {len(region_ids)} in {region or 'no region'})")
+        else:
+            print("✗ Filtered list does not match a manual scan")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Filter testing failed: {e}")
+        return False
+    
+    # Test 12: Name and address search
+    print("\n12. Testing citizen search...")
+    try:
+        prefix_ids = {c["national_id"] for c in be.search_citizens("test citiz")}
+        typo_ids = {c["national_id"] for c in be.search_citizens("Test Citzen")}
+        address_ids = {c["national_id"] for c in be.search_citizens("test addr")}
+        if "999888777" in prefix_ids and "999888777" in typo_ids and "999888777" in address_ids:
+            print("✓ Search finds the test citizen by name prefix, misspelling and address")
+        else:
+            print("✗ Search did not find the test citizen")
+            return False
+
+        # A write patches the warm index instead of dropping it
+        be.warm_search_index()
+        index = be._cached_index("citizens", "citizens.search")
+        stored = be.find_citizen_by_national_id("999888777")
+        be.update_citizen_details_csv(citizen_id, dict(stored, full_name="Test Citizen Renamed"))
+        start = time.perf_counter()
+        renamed_ids = {c["national_id"] for c in be.search_citizens("renamed")}
+        elapsed = time.perf_counter() - start
+        be.update_citizen_details_csv(citizen_id, stored)
+        if "999888777" in renamed_ids and be._cached_index("citizens", "citizens.search") is index and elapsed < 0.05:
+            print(f"✓ Search after a write used the warm index ({elapsed * 1000:.1f} ms)")
+        else:
+            print(f"✗ Search after a write was not served by the warm index ({elapsed * 1000:.1f} ms)")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Search testing failed: {e}")
+        return False
+    
+    # Test 13: Columnar snapshot (optional, needs NumPy)
+    print("\n13. Testing citizen snapshot...")
+    try:
+        import citizen_snapshot
+    except ImportError:
+        print("- Skipped: NumPy is not installed")
+    else:
+        try:
+            criteria = {"priority_score": {"min": 5}, "is_active": True}
+            expected_ids = be.get_citizen_ids(sort_by="table", filter_criteria=criteria)
+            # Registration dates are read by the backend's parser, in any format it accepts
+            same_day = {str(citizen_snapshot._day(text)) for text in ("2025-06-05", "6/5/2025", "06. 05. 2025  4:28:00 PM")}
+            if (citizen_snapshot.citizen_ids(criteria) == expected_ids and same_day == {"2025-06-05"} and
+                citizen_snapshot.count_citizens() == len(be.get_citizen_ids(sort_by="table", include_inactive=True))):
+                print(f"✓ Snapshot filters match the backend ({len(expected_ids)} citizens)")
+            else:
+                print("✗ Snapshot does not match the backend")
+                return False
+                
+        except Exception as e:
+            print(f"✗ Snapshot testing failed: {e}")
+            return False
+    
+    # Test 14: Priority score recomputation (preview only, scores are left as they are)
+    print("\n14. Testing priority score recomputation...")
+    try:
+        before = [c["priority_score"] for c in be.get_citizens_list_csv(sort_by="id", include_inactive=True)]
+        report = be.recompute_priority_scores(dry_run=True)
+        after = [c["priority_score"] for c in be.get_citizens_list_csv(sort_by="id", include_inactive=True)]
+        expected = be._policy_scores(be.DEFAULT_SCORE_POLICY, 4, 2, 0.0, float("inf"))
+        # Pending entries are not delivered aid, so they must not cost the never-received bonus
+        aided_ids = set(be._days_since_last_aid(datetime.date.today()))
+        if (report["citizens"] == len(before) and report["raised"] + report["lowered"] == report["changed"] and
+            before == after and expected == 4.2 and aided_ids <= be.get_received_aid_ids()):
+            print(f"✓ Score preview successful ({report['changed']} of {report['citizens']} would change)")
+        else:
+            print(f"✗ Score preview failed: {report}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Score recomputation testing failed: {e}")
+        return False
+    
+    # Test 15: Streaming Excel export (optional, needs openpyxl)
+    print("\n15. Testing Excel export...")
+    try:
+        import excel_export
+        import openpyxl
+    except ImportError:
+        print("- Skipped: openpyxl is not installed")
+    else:
+        try:
+            expected = len(be.get_citizens_list_csv(sort_by="id"))
+            with tempfile.TemporaryDirectory() as temp_dir:
+                file_path = os.path.join(temp_dir, "citizens.xlsx")
+                rows, sheets = excel_export.export_citizens_to_excel(file_path, max_rows_per_sheet=6)
+                workbook = openpyxl.load_workbook(file_path, read_only=True)
+                sheet_rows = sum(sum(1 for _ in worksheet.iter_rows(min_row=2)) for worksheet in workbook.worksheets)
+                workbook.close()
+            if rows == expected == sheet_rows and sheets == len(workbook.sheetnames) == -(-expected // 5):
+                print(f"✓ Excel export successful ({rows} citizens in {sheets} worksheets)")
+            else:
+                print(f"✗ Excel export wrote {rows} rows in {sheets} worksheets, expected {expected}")
+                return False
+                
+        except Exception as e:
+            print(f"✗ Excel export testing failed: {e}")
+            return False
+    
+    # Test 16: Password hash formats
+    print("\n16. Testing password hash formats...")
+    try:
+        pbkdf2_hash = be.hash_secret("s3cret", kdf=be.PBKDF2_PREFIX, iterations=1000)
+        wrapped_hash = be.upgrade_legacy_hash(be._hash_password("s3cret"), iterations=1000)
+        if (be.verify_secret("s3cret", pbkdf2_hash) and not be.verify_secret("wrong", pbkdf2_hash) and
+            be.verify_secret("s3cret", wrapped_hash) and not be.verify_secret("wrong", wrapped_hash) and
+            be.verify_secret("s3cret", be._hash_password("s3cret")) and be.upgrade_legacy_hash(pbkdf2_hash) == pbkdf2_hash):
+            print("✓ Legacy, PBKDF2 and wrapped legacy hashes verify correctly")
+        else:
+            print("✗ Password hash verification failed")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Password hash testing failed: {e}")
+        return False
+
+    # Test 17: Legacy file normalization
+    print("\n17. Testing legacy file normalization...")
+    try:
+        import normalize_legacy_data
+        legacy = ('\ufeff"id\tcitizen_internal_id\tentry_type\tdate\tnext_date\ttimestamp"\r\n'
+                  '"1\t6\tfood_distribution\t27. 04. 2025\t06. 15. 2025\t04. 27. 2025  4:28:00 PM"\r\n'
+                  '"\t\t\t\t\t"\r\n'
+                  '1,7,AdminEntry,2025-07-06,2025-7-9,2025-07-06T03:38:44.707089\r\n'
+                  '1,None,AdminEntry,2025-07-06,,2025-07-06T15:37:07.011578\r\n')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "aid_history.csv")
+            with open(file_path, "w", newline="", encoding="utf-8") as f:
+                f.write(legacy)
+            report = normalize_legacy_data.normalize_csv_file("aid_history", file_path)
+            rows = list(be.read_csv_dict(file_path, be.AID_HISTORY_FIELDNAMES))
+            rejected = list(be.read_csv_dict(os.path.join(temp_dir, "aid_history.rejected.csv"), ["reason"]))
+        typed = normalize_legacy_data.typed_row("aid_history", rows[0])
+        if (report["rows"] == 2 and report["blank"] == 1 and report["renumbered"] == 1 and len(rejected) == 1 and
+            [row["id"] for row in rows] == ["1", "2"] and
+            (rows[0]["date"], rows[0]["next_date"], rows[0]["timestamp"]) == ("2025-04-27", "2025-06-15", "2025-04-27T16:28:00") and
+            rows[1]["next_date"] == "2025-07-09" and typed["citizen_internal_id"] == 6 and
+            typed["next_date"] == datetime.date(2025, 6, 15)):
+            print("✓ Legacy rows normalized to ISO-8601 CSV")
+        else:
+            print(f"✗ Legacy normalization failed: {report}, {rows}")
+            return False
+
+    except Exception as e:
+        print(f"✗ Legacy normalization testing failed: {e}")
+        return False
+
+    # Tests 18 and 19 write aid entries dated in the future; they run on an in-memory
+    # copy of the data so the data files, and later runs, are not affected
+    with isolated_storage():
+        # Test 18: Due-for-aid range queries
+        print("\n18. Testing due-for-aid queries...")
+        try:
+            be.save_aid_history_entry(citizen_id, "TestAid", "2024-03-16", "2031-5-20")
+            due = be.due_between("2031-05-01", datetime.date(2031, 5, 31))
+            due_ids = [citizen["id"] for citizen in due]
+            scores = [citizen["priority_score"] for citizen in due]
+            in_region = be.due_between("2031-05-01", "2031-05-31", region="Gaza")
+            listed_ids = be.due_citizen_ids("2031-05-01", "2031-05-31")
+            be.save_aid_history_entry(citizen_id, "TestAid", "2024-03-17", "")  # Received again: no longer due
+            if (int(citizen_id) in due_ids and scores == sorted(scores, reverse=True) and
+                due_ids == listed_ids and
+                due[due_ids.index(int(citizen_id))]["next_date"] == "2031-05-20" and
+                int(citizen_id) not in [citizen["id"] for citizen in in_region] and
+                int(citizen_id) not in be.due_citizen_ids("2031-05-01", "2031-05-31")):
+                print(f"✓ Due-for-aid queries successful ({len(due)} citizens due)")
+            else:
+                print(f"✗ Due-for-aid query returned {due_ids}")
+                return False
+
+        except Exception as e:
+            print(f"✗ Due-for-aid testing failed: {e}")
+            return False
+
+        # Test 19: Distribution planning
+        print("\n19. Testing distribution planning...")
+        try:
+            stock = {"food_distribution": 4, "TestKit": 6}
+            preview = be.plan_distribution(stock, "2031-06-01", dry_run=True)
+            plan = be.plan_distribution(stock, "2031-06-01")
+            recipients = sorted({allocation["citizen_id"] for allocation in plan["allocations"]})
+            scores = [allocation["priority_score"] for allocation in plan["allocations"] if allocation["entry_type"] == "TestKit"]
+            due_ids = sorted(be.due_citizen_ids("2031-06-01", "2031-06-01"))
+            kit_ids = {a["citizen_id"] for a in plan["allocations"] if a["entry_type"] == "TestKit"}
+            same_day = be.plan_distribution({"TestKit": 2}, "2031-06-01", dry_run=True)
+            # Only delivered aid starts the cooldown; scheduled citizens can be planned on another day
+            delivered_id = min(kit_ids)
+            be.save_aid_history_entry(delivered_id, "TestKit", "2031-06-01", "")
+            later = be.plan_distribution({"TestKit": 1000}, "2031-06-10", cooldown_days=30, dry_run=True)
+            later_ids = {a["citizen_id"] for a in later["allocations"]}
+            if (preview["allocations"] == plan["allocations"] and not plan["dry_run"] and
+                all(result["allocated"] <= result["stock"] for result in plan["by_type"].values()) and
+                sum(allocation["units"] for allocation in plan["allocations"] if allocation["entry_type"] == "TestKit") <= 6 and
+                scores == sorted(scores, reverse=True) and
+                due_ids == recipients and
+                not {a["citizen_id"] for a in same_day["allocations"]} & kit_ids and
+                delivered_id not in later_ids and kit_ids - {delivered_id} <= later_ids):
+                print(f"✓ Distribution plan saved ({len(plan['allocations'])} pending aid entries)")
+            else:
+                print(f"✗ Distribution planning failed: {plan}")
+                return False
+
+        except Exception as e:
+            print(f"✗ Distribution planning testing failed: {e}")
+            return False
+
     print("\n" + "="*60)
     print("ALL BACKEND TESTS PASSED SUCCESSFULLY!")
     print("="*60)